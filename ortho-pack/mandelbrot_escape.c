@@ -0,0 +1,95 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include "ortho_sampling_generate.h"
+
+#define LANES      8      // number of orbits one thread iterates side by side
+#define BLOCK_SIZE 4096   // number of points one thread takes from the queue at a time
+
+/* Iterate the points begin..end-1 with LANES independent orbits in flight.
+   A single orbit is a chain of dependent multiplications, so one point at a time leaves the
+   CPU waiting on latency. With several lanes the updates are independent (and vectorizable),
+   and as soon as a lane finishes it is refilled with the next point of the block, so long
+   orbits inside the set do not hold up the lanes of the points which escape quickly. */
+static void escape_time_block(const double *c_real, const double *c_imag, long begin, long end, int max_iter, int *escape_iter)
+{
+    double cr[LANES], ci[LANES], zr[LANES], zi[LANES], zr2[LANES], zi2[LANES];
+    long point[LANES];
+    int iter[LANES];
+    long next = begin;
+    int lane, active = 0;
+
+    for (lane = 0; lane < LANES; lane++) {
+        zr[lane] = zi[lane] = zr2[lane] = zi2[lane] = 0.0;
+        iter[lane] = 0;
+        if (next < end) {
+            point[lane] = next;
+            cr[lane] = c_real[next];
+            ci[lane] = c_imag[next];
+            next++;
+            active++;
+        } else {
+            // idle lane, c = 0 keeps its orbit at 0
+            point[lane] = -1;
+            cr[lane] = ci[lane] = 0.0;
+        }
+    }
+
+    while (active > 0) {
+        for (lane = 0; lane < LANES; lane++) {
+            // the imaginary part goes first as it needs the old real part
+            zi[lane] = 2.0 * zr[lane] * zi[lane] + ci[lane];
+            zr[lane] = zr2[lane] - zi2[lane] + cr[lane];
+            zr2[lane] = zr[lane] * zr[lane];
+            zi2[lane] = zi[lane] * zi[lane];
+            iter[lane]++;
+        }
+
+        for (lane = 0; lane < LANES; lane++) {
+            int escaped = zr2[lane] + zi2[lane] > 4.0;
+            if (point[lane] < 0 || (!escaped && iter[lane] < max_iter)) {
+                continue;
+            }
+            escape_iter[point[lane]] = escaped ? iter[lane] : 0;
+
+            // refill the lane with the next point, or let it idle
+            zr[lane] = zi[lane] = zr2[lane] = zi2[lane] = 0.0;
+            iter[lane] = 0;
+            if (next < end) {
+                point[lane] = next;
+                cr[lane] = c_real[next];
+                ci[lane] = c_imag[next];
+                next++;
+            } else {
+                point[lane] = -1;
+                cr[lane] = ci[lane] = 0.0;
+                active--;
+            }
+        }
+    }
+}
+
+/* Escape time kernel for the Mandelbrot set.
+   For every point c = c_real[i] + i * c_imag[i] the orbit z = z^2 + c (z0 = 0) is iterated until
+   |z|^2 > 4 or max_iter iterations are done. escape_iter[i] gets the first iteration with |z|^2 > 4
+   (counting from 1), or 0 if the orbit stayed bounded, the same convention as the Python kernel.
+   The blocks of points are spread over the OpenMP threads dynamically since the work per point
+   is very uneven near the boundary. */
+void mandelbrot_escape_time(const double *c_real, const double *c_imag, long num_points, int max_iter, int *escape_iter)
+{
+    long block;
+    long num_blocks = (num_points + BLOCK_SIZE - 1) / BLOCK_SIZE;
+
+    if (max_iter < 1) {
+        for (block = 0; block < num_points; block++) {
+            escape_iter[block] = 0;
+        }
+        return;
+    }
+
+    #pragma omp parallel for schedule(dynamic, 1)
+    for (block = 0; block < num_blocks; block++) {
+        long begin = block * BLOCK_SIZE;
+        long end = begin + BLOCK_SIZE < num_points ? begin + BLOCK_SIZE : num_points;
+        escape_time_block(c_real, c_imag, begin, end, max_iter, escape_iter);
+    }
+}
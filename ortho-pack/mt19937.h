@@ -42,9 +42,25 @@
    email: matumoto@math.keio.ac.jp
 */
 
+/* state of one generator for the reentrant _r functions below,
+   every caller owns its state so concurrent streams do not interfere */
+typedef struct {
+    unsigned long mt[624];
+    int mti;
+} mt19937_state;
+
 /* initializes mt[N] with a seed */
 void init_genrand(unsigned long s);
 
+/* initializes the given state with a seed */
+void init_genrand_r(mt19937_state *state, unsigned long s);
+
+/* generates a random number on [0,0xffffffff]-interval from the given state */
+unsigned long genrand_int32_r(mt19937_state *state);
+
+/* generates a random number on [0,1)-real-interval from the given state */
+double genrand_real2_r(mt19937_state *state);
+
 /* initializes mt[N] with a seed */
 void shift_init_genrand(unsigned long s, int shift);
 
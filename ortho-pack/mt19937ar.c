@@ -42,6 +42,7 @@
 */
 
 #include <stdio.h>
+#include "mt19937.h"
 
 /* Period parameters */  
 #define N 624
@@ -69,6 +70,22 @@ void init_genrand(unsigned long s)
     }
 }
 
+/* initializes the given state with a seed, same as init_genrand */
+void init_genrand_r(mt19937_state *state, unsigned long s)
+{
+    unsigned long *st = state->mt;
+    int i;
+
+    st[0]= s & 0xffffffffUL;
+    for (i=1; i<N; i++) {
+        st[i] = 
+	    (1812433253UL * (st[i-1] ^ (st[i-1] >> 30)) + i); 
+        st[i] &= 0xffffffffUL;
+        /* for >32 bit machines */
+    }
+    state->mti = N;
+}
+
 /* initializes mt[N] with a seed */
 void shift_init_genrand(unsigned long s, int shift)
 {
@@ -170,6 +187,43 @@ unsigned long genrand_int32(void)
     return y;
 }
 
+/* generates a random number on [0,0xffffffff]-interval from the given state,
+   same as genrand_int32 */
+unsigned long genrand_int32_r(mt19937_state *state)
+{
+    unsigned long *st = state->mt;
+    unsigned long y;
+    static const unsigned long mag01[2]={0x0UL, MATRIX_A};
+    /* mag01[x] = x * MATRIX_A  for x=0,1 */
+
+    if (state->mti >= N) { /* generate N words at one time */
+        int kk;
+
+        for (kk=0;kk<N-M;kk++) {
+            y = (st[kk]&UPPER_MASK)|(st[kk+1]&LOWER_MASK);
+            st[kk] = st[kk+M] ^ (y >> 1) ^ mag01[y & 0x1UL];
+        }
+        for (;kk<N-1;kk++) {
+            y = (st[kk]&UPPER_MASK)|(st[kk+1]&LOWER_MASK);
+            st[kk] = st[kk+(M-N)] ^ (y >> 1) ^ mag01[y & 0x1UL];
+        }
+        y = (st[N-1]&UPPER_MASK)|(st[0]&LOWER_MASK);
+        st[N-1] = st[M-1] ^ (y >> 1) ^ mag01[y & 0x1UL];
+
+        state->mti = 0;
+    }
+  
+    y = st[state->mti++];
+
+    /* Tempering */
+    y ^= (y >> 11);
+    y ^= (y << 7) & 0x9d2c5680UL;
+    y ^= (y << 15) & 0xefc60000UL;
+    y ^= (y >> 18);
+
+    return y;
+}
+
 unsigned long genrand_alt_int32(void)
 {
     static unsigned long y = 0x3572c645UL;
@@ -197,6 +251,13 @@ double genrand_real2(void)
     /* divided by 2^32 */
 }
 
+/* generates a random number on [0,1)-real-interval from the given state */
+double genrand_real2_r(mt19937_state *state)
+{
+    return genrand_int32_r(state)*(1.0/4294967296.0); 
+    /* divided by 2^32 */
+}
+
 /* generates a random number on (0,1)-real-interval */
 double genrand_real3(void)
 {
@@ -9,12 +9,25 @@
 #include "mt19937.h"
 #include "rand_support.h"
 #include "ortho_sampling_generate.h"
+#ifdef _OPENMP
+    #include <omp.h>
+#endif
 
 #define SAMPLES(major) ((major) * (major))
 
 void ortho_sampling_generate(int major, int runs, double min_bound_real, double max_bound_real, double min_bound_imag, double max_bound_imag, double *points_real, double *points_imag)
+{
+    // the fixed seed of the original generator, it gives the same points as before
+    ortho_sampling_generate_seeded(major, runs, min_bound_real, max_bound_real, min_bound_imag, max_bound_imag, points_real, points_imag, 3737);
+}
+
+/* Same as ortho_sampling_generate, but with the given seed and a generator state which lives
+   on the stack of the call, so calls with different seeds give independent point sets
+   and concurrent calls do not share any state. */
+void ortho_sampling_generate_seeded(int major, int runs, double min_bound_real, double max_bound_real, double min_bound_imag, double max_bound_imag, double *points_real, double *points_imag, unsigned long seed)
 {
     int i, j, k, m;
+    mt19937_state rng;
     long double range_real = max_bound_real - min_bound_real;
     long double range_imag = max_bound_imag - min_bound_imag;
     long double scale_real = range_real / ((long double) SAMPLES(major));
@@ -28,7 +41,7 @@ void ortho_sampling_generate(int major, int runs, double min_bound_real, double
         ylist[i] = malloc(major * sizeof(long));
     }
 
-    init_genrand(3737);
+    init_genrand_r(&rng, seed);
     m = 0;
 
     // init xlist and ylist
@@ -44,15 +57,15 @@ void ortho_sampling_generate(int major, int runs, double min_bound_real, double
     for (k = 0; k < runs; k++) {
         for (i = 0; i < major; i++) {
             // permute xlist[i] and ylist[i]
-            permute(xlist[i], major);
-            permute(ylist[i], major);
+            permute_r(&rng, xlist[i], major);
+            permute_r(&rng, ylist[i], major);
         }
         for (i = 0; i < major; i++) {  // sub-square column
             for (j = 0; j < major; j++) {  // sub-square row
                 // generate x coordinate
-                x = min_bound_real + scale_real * (xlist[i][j] + (long double) genrand_real2());
+                x = min_bound_real + scale_real * (xlist[i][j] + (long double) genrand_real2_r(&rng));
                 // generate y coordinate
-                y = min_bound_imag + scale_imag * (ylist[j][i] + (long double) genrand_real2());
+                y = min_bound_imag + scale_imag * (ylist[j][i] + (long double) genrand_real2_r(&rng));
 
                 // store the real and imaginary parts of the point
                 points_real[point_index] = x;
@@ -70,3 +83,138 @@ void ortho_sampling_generate(int major, int runs, double min_bound_real, double
     free(xlist);
     free(ylist);
 }
+
+/* splitmix64 step, spreads (seed, run, row, stream) over well separated MT19937 seeds */
+static unsigned long mix_seed(unsigned long long x)
+{
+    x += 0x9e3779b97f4a7c15ULL;
+    x = (x ^ (x >> 30)) * 0xbf58476d1ce4e5b9ULL;
+    x = (x ^ (x >> 27)) * 0x94d049bb133111ebULL;
+    x = x ^ (x >> 31);
+    return (unsigned long) (x & 0xffffffffULL);
+}
+
+static unsigned long row_seed(unsigned long seed, int run, int row, int stream)
+{
+    unsigned long long key = ((unsigned long long) seed << 32) ^ ((unsigned long long) run << 24) ^ ((unsigned long long) row << 1) ^ (unsigned long long) stream;
+    return mix_seed(key);
+}
+
+/* Permute a row of ints with the given generator (the lists of the batch sampler are int, half the memory of long) */
+static void permute_row(mt19937_state *rng, int *row, int n)
+{
+    int i, h;
+    unsigned long r;
+    for (i = n - 1; i > 0; i--) {
+        h = row[i];
+        r = getrand_inrange_r(rng, (unsigned long) i);
+        row[i] = row[r];
+        row[r] = h;
+    }
+}
+
+/* High throughput version of ortho_sampling_generate for large majors.
+   - the minor rows are kept in flat int arrays (row i starts at i * major) instead of one malloc per row,
+     xlist is not stored at all, every point row permutes its own x row right before using it
+   - every major row has its own generator streams, seeded from (seed, run, row), so the rows are
+     permuted and filled in parallel with OpenMP and the result does not depend on the thread count,
+     every run starts from fresh random permutations
+   - ylist is transposed once per run, so the point loop reads it contiguously
+   - double arithmetic instead of long double
+   - the points are written interleaved (real, imag, real, imag, ...) into the caller's buffer,
+     run k starts at points + 2 * k * major * major, so runs > 1 gives several replicates
+   num_threads <= 0 uses the OpenMP default. Returns 0, or -1 if the lists could not be allocated. */
+int ortho_sampling_generate_batch(int major, int runs, double min_bound_real, double max_bound_real, double min_bound_imag, double max_bound_imag, double *points, unsigned long seed, int num_threads)
+{
+    long num_samples = (long) major * major;
+    double scale_real = (max_bound_real - min_bound_real) / (double) num_samples;
+    double scale_imag = (max_bound_imag - min_bound_imag) / (double) num_samples;
+    int *ylist = malloc(num_samples * sizeof(int));
+    int *ylist_t = malloc(num_samples * sizeof(int));
+    int i, k, failed = 0;
+
+#ifdef _OPENMP
+    if (num_threads <= 0) {
+        num_threads = omp_get_max_threads();
+    }
+#else
+    (void) num_threads;
+#endif
+
+    if (ylist == NULL || ylist_t == NULL) {
+        free(ylist);
+        free(ylist_t);
+        return -1;
+    }
+
+    for (k = 0; k < runs; k++) {
+        double *run_points = points + 2 * (long) k * num_samples;
+
+        // ylist row j holds a permutation of the minor rows j * major .. j * major + major - 1
+        #pragma omp parallel for schedule(static) num_threads(num_threads)
+        for (i = 0; i < major; i++) {
+            mt19937_state rng;
+            int *row = ylist + (long) i * major;
+            int j;
+
+            for (j = 0; j < major; j++) {
+                row[j] = i * major + j;
+            }
+            init_genrand_r(&rng, row_seed(seed, k, i, 0));
+            permute_row(&rng, row, major);
+        }
+
+        // ylist_t[i][j] = ylist[j][i], in tiles so both sides stay in cache
+        #pragma omp parallel for schedule(static) num_threads(num_threads)
+        for (i = 0; i < major; i += 64) {
+            int j, ii, jj;
+            for (j = 0; j < major; j += 64) {
+                for (ii = i; ii < i + 64 && ii < major; ii++) {
+                    for (jj = j; jj < j + 64 && jj < major; jj++) {
+                        ylist_t[(long) ii * major + jj] = ylist[(long) jj * major + ii];
+                    }
+                }
+            }
+        }
+
+        // sub-square column i, sub-square row j, the x row and the jitter come from the row's second stream
+        #pragma omp parallel num_threads(num_threads)
+        {
+            int *xrow = malloc(major * sizeof(int));
+            int row_index;
+
+            if (xrow == NULL) {
+                #pragma omp atomic write
+                failed = 1;
+            }
+            #pragma omp for schedule(static)
+            for (row_index = 0; row_index < major; row_index++) {
+                mt19937_state rng;
+                const int *yrow = ylist_t + (long) row_index * major;
+                double *row_points = run_points + 2 * (long) row_index * major;
+                int j;
+
+                if (xrow == NULL) {
+                    continue;
+                }
+                init_genrand_r(&rng, row_seed(seed, k, row_index, 1));
+                for (j = 0; j < major; j++) {
+                    xrow[j] = row_index * major + j;
+                }
+                permute_row(&rng, xrow, major);
+                for (j = 0; j < major; j++) {
+                    row_points[2 * j] = min_bound_real + scale_real * ((double) xrow[j] + genrand_real2_r(&rng));
+                    row_points[2 * j + 1] = min_bound_imag + scale_imag * ((double) yrow[j] + genrand_real2_r(&rng));
+                }
+            }
+            free(xrow);
+        }
+        if (failed) {
+            break;
+        }
+    }
+
+    free(ylist);
+    free(ylist_t);
+    return failed ? -1 : 0;
+}
@@ -9,4 +9,10 @@
 
 EXPORT void ortho_sampling_generate(int major, int runs, double min_bound_real, double max_bound_real, double min_bound_imag, double max_bound_imag, double *points_real, double *points_imag);
 
+EXPORT void ortho_sampling_generate_seeded(int major, int runs, double min_bound_real, double max_bound_real, double min_bound_imag, double max_bound_imag, double *points_real, double *points_imag, unsigned long seed);
+
+EXPORT int ortho_sampling_generate_batch(int major, int runs, double min_bound_real, double max_bound_real, double min_bound_imag, double max_bound_imag, double *points, unsigned long seed, int num_threads);
+
+EXPORT void mandelbrot_escape_time(const double *c_real, const double *c_imag, long num_points, int max_iter, int *escape_iter);
+
 #endif // ORTHO_SAMPLING_H
\ No newline at end of file
@@ -97,6 +97,47 @@ permute(long list[], unsigned long N)
     }
 }
 
+/* Reentrant version of getrand_inrange */
+unsigned long
+getrand_inrange_r(mt19937_state *state, unsigned long range)
+{
+    unsigned long long N = MAX_UNSIGNED_RAND;
+    unsigned long long rp1;
+    unsigned long divisor;
+    unsigned long reject_above;
+    unsigned long r;
+    if (range)
+    {
+        N++;
+        rp1 = range;
+        rp1++;
+        divisor = N / rp1;
+        reject_above = rp1 * divisor - 1;
+        do
+        {
+            r = genrand_int32_r(state);
+        } while (r > reject_above);
+        return (r / divisor);
+    }
+    return 0;
+}
+
+/* Reentrant version of permute */
+void
+permute_r(mt19937_state *state, long list[], unsigned long N)
+{
+    unsigned long i;
+    long h;
+    unsigned long r;
+    for (i = N-1; i; i--)
+    {
+        h = list[i];
+        r = getrand_inrange_r(state, i);
+        list[i] = list[r];
+        list[r] = h;
+    }
+}
+
 /*  testing code
 int
 main()
@@ -30,3 +30,12 @@ getrand_inrange(unsigned long range);
 
 void
 permute(long list[], unsigned long N);
+
+/* Reentrant versions of getrand_inrange and permute,
+   they draw from the given generator state instead of the global one */
+
+unsigned long
+getrand_inrange_r(mt19937_state *state, unsigned long range);
+
+void
+permute_r(mt19937_state *state, long list[], unsigned long N);
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+ESCAPE_CACHE_DIR = '../simulation_results/escape_cache'
+
+# bump it whenever a kernel change can change escape iterations, old entries are then never hit again
+KERNEL_VERSION = 1
+
+class EscapeCache:
+    """
+    On-disk cache of escape iterations. Every entry is a .npy file of the escape iterations of one
+    sample set, evaluated up to some max_iter, plus a small .json file with that max_iter.
+    Entries are opened with np.load(mmap_mode='r'), so a hit costs no copy, and the least recently
+    used entries are deleted once the .npy files add up to more than max_bytes.
+    """
+    def __init__(self, cache_dir=ESCAPE_CACHE_DIR, max_bytes=4 * 2**30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def make_key(self, *parts):
+        """
+        Key of a sample set, e.g. (sampler, size, seed, ranges) plus the kernel options that change the result.
+        Input: any values with a stable repr
+        Output: hex digest used as the file name
+        """
+        return hashlib.sha1(repr((KERNEL_VERSION,) + parts).encode()).hexdigest()
+
+    def load(self, key):
+        """
+        Input: key of make_key
+        Output: (read only memmap of the escape iterations, max_iter they were evaluated up to), or (None, 0)
+        """
+        npy_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, "r") as file:
+                max_iter = json.load(file)["max_iter"]
+            escape_iter = np.load(npy_path, mmap_mode='r')
+            # the modification time is the LRU order, another process can evict the entry in between
+            os.utime(npy_path)
+        except (FileNotFoundError, ValueError, KeyError):
+            return None, 0
+        return escape_iter, max_iter
+
+    def store(self, key, escape_iter, max_iter):
+        # write to temporary files and rename them, so other processes never see half an entry
+        os.makedirs(self.cache_dir, exist_ok=True)
+        npy_path, meta_path = self._paths(key)
+        np.save(npy_path + f".{os.getpid()}.tmp.npy", escape_iter)
+        os.replace(npy_path + f".{os.getpid()}.tmp.npy", npy_path)
+        with open(meta_path + f".{os.getpid()}.tmp", "w") as file:
+            json.dump({"max_iter": int(max_iter), "num_samples": len(escape_iter)}, file)
+        os.replace(meta_path + f".{os.getpid()}.tmp", meta_path)
+        self.evict()
+
+    def evict(self):
+        # delete the least recently used entries until the cache fits into max_bytes
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.endswith(".npy") and ".tmp" not in file_name:
+                # other processes evict as well, an entry can be gone since listdir
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, file_name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, file_name[:-len(".npy")]))
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total_bytes -= size
+
+    def _paths(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npy"), os.path.join(self.cache_dir, f"{key}.json")
@@ -0,0 +1,91 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import time
+
+from joblib import Parallel, delayed
+
+FIGURE_MANIFEST_PATH = '../images/figure_hashes.json'
+
+class FigurePipeline:
+    """
+    Collects plot jobs and renders them in a process pool on the Agg backend.
+    Every job is a plot function with its arguments and the output file (or the file name prefix of a
+    function which writes several files) and the list of all the files it writes. The hash of the source
+    of the module of the function (so a changed helper counts as well), the arguments and the extra
+    inputs (the data a function loads by itself) is kept in a manifest next to the images, a job whose
+    hash is unchanged and whose files all exist is skipped.
+    """
+    def __init__(self, manifest_path=FIGURE_MANIFEST_PATH):
+        self.manifest_path = manifest_path
+        self.jobs = []
+
+    def add(self, plot_function, *args, output, files=None, pass_output=True, inputs=None, **kwargs):
+        """
+        The output is passed as the last positional argument, like the file names of the plot functions in utils,
+        pass_output=False is for functions with a fixed output (the metrics plots).
+        files are all the files the job writes, the output file itself by default; a prefix output needs them.
+        Input: plot function, its positional arguments, output file or prefix, files, pass_output, extra inputs to hash, its keyword arguments
+        """
+        if pass_output:
+            args = args + (output,)
+        self.jobs.append({"function": plot_function, "args": args, "kwargs": kwargs, "output": output,
+                          "files": list(files) if files is not None else [output],
+                          "hash": self._hash(plot_function, args, kwargs, inputs)})
+
+    def run(self, n_jobs=-1, force=False):
+        """
+        Render the jobs whose hash changed (all of them with force) and report the render time of every figure.
+        Output: dict of output -> render seconds, None for the skipped ones
+        """
+        manifest = self._load_manifest()
+        # a job is rendered again if any of its files is missing
+        pending = [job for job in self.jobs if force or manifest.get(job["output"]) != job["hash"] or not all(os.path.exists(file) for file in job["files"])]
+        timings = {job["output"]: None for job in self.jobs}
+        pending_ids = {id(job) for job in pending}
+        for job in self.jobs:
+            if id(job) not in pending_ids:
+                print(f"Figure {job['output']} is up to date, skipped")
+
+        start_time = time.perf_counter()
+        results = Parallel(n_jobs=n_jobs, backend="loky", return_as="generator_unordered")(
+            delayed(_render_figure)(index, job["function"], job["args"], job["kwargs"]) for index, job in enumerate(pending))
+        for index, elapsed in results:
+            job = pending[index]
+            timings[job["output"]] = elapsed
+            # the manifest is written after every figure, an interrupted run keeps what it rendered
+            manifest[job["output"]] = job["hash"]
+            self._store_manifest(manifest)
+            print(f"Figure {job['output']} rendered in {elapsed:.2f} s")
+        print(f"{len(pending)} of {len(self.jobs)} figures rendered in {time.perf_counter() - start_time:.2f} s")
+        self.jobs = []
+        return timings
+
+    def _hash(self, plot_function, args, kwargs, inputs):
+        # the source of the whole module is part of the hash, so a changed plot or a changed helper it calls is rendered again
+        module_source = inspect.getsource(inspect.getmodule(plot_function))
+        content = (plot_function.__module__, plot_function.__qualname__, module_source, args, sorted(kwargs.items()), inputs)
+        return hashlib.sha1(pickle.dumps(content, protocol=4)).hexdigest()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _store_manifest(self, manifest):
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+        with open(self.manifest_path + ".tmp", "w") as file:
+            json.dump(manifest, file, indent=1, sort_keys=True)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+def _render_figure(index, plot_function, args, kwargs):
+    # the workers have no display, the figures only go to files
+    import matplotlib
+    matplotlib.use("Agg")
+    start_time = time.perf_counter()
+    plot_function(*args, **kwargs)
+    return index, time.perf_counter() - start_time
@@ -1,11 +1,13 @@
+import argparse
 import os
 import sys
 import threading
 import time
 import multiprocessing as mp
-from joblib import Parallel, delayed
-import itertools
 import mandelbrot_analysis
+import escape_cache
+import result_store
+import figure_pipeline
 import utils
 import metrics
 import matplotlib.pyplot as plt
@@ -23,8 +25,18 @@ def show_wait_message(msg = "Hang in there, it's almost done"):
         idx += 1
         time.sleep(0.5)
 
-# initialize the MandelbrotAnalysis platform
-mandelbrotAnalysisPlatform = mandelbrot_analysis.MandelbrotAnalysis(real_range=(-2, 2), imag_range=(-2, 2))
+# initialize the MandelbrotAnalysis platform, by default it samples the whole plane like the results in simulation_results,
+# --symmetric samples only the upper half (the set is symmetric about the real axis),
+# --domain box or disk only the bounding box of the set or the disk |c| <= 2
+def create_platform(symmetric=False, domain=None):
+    platform = mandelbrot_analysis.MandelbrotAnalysis(real_range=(-2, 2), imag_range=(-2, 2), symmetric=symmetric, domain=domain)
+    # the escape iterations of deterministic sample sets (the ortho designs) are kept on disk between runs
+    platform.escape_cache = escape_cache.EscapeCache()
+    return platform
+
+mandelbrotAnalysisPlatform = create_platform()
+# every finished configuration is appended to the result store, an interrupted sweep resumes where it stopped
+resultStore = result_store.ResultStore()
 
 # -----------------------------------------------------------color_mandelbrot-----------------------------------------------------------
 def run_mset_colors():
@@ -32,19 +44,10 @@ def run_mset_colors():
     num_samples_list              = [6400, 10000, 90000] # 50, 80, 100
     num_samples_list_perfect_root = [80, 100, 300] # perfect square root for orthogonal sampling, sample size is square of this number!!!
     max_iter_list = [100, 200]
-    mset_list = list(itertools.product(num_samples_list, max_iter_list))
-
-    # pure random sampling and LHS sampling can be run in parallel
-    if os.name == 'nt':
-        num_workers = mp.cpu_count()
-        Parallel(n_jobs=num_workers)(delayed(utils.mset_colors_parallel)(mandelbrotAnalysisPlatform, num_samples, max_iter) for num_samples, max_iter in mset_list)
-    else:
-        for num_samples, max_iter in mset_list:
-            utils.mset_colors_parallel(mandelbrotAnalysisPlatform, num_samples, max_iter)
 
-    # orthogonal sampling has to be run sequentially
-    mandelbrotAnalysisPlatform._load_library()
-    utils.mset_colors_ortho_seq(mandelbrotAnalysisPlatform, num_samples_list_perfect_root, max_iter_list)
+    # all three methods run in worker processes, including orthogonal sampling: the platform
+    # drops its library handle when it is pickled and every worker loads the library itself
+    utils.mset_colors_process_pool(mandelbrotAnalysisPlatform, num_samples_list, num_samples_list_perfect_root, max_iter_list, n_jobs=mp.cpu_count())
 
 
 # -----------------------------------------------------------generate true area-----------------------------------------------------------------
@@ -64,13 +67,13 @@ def run_mset_statistic_and_plot():
     if trueA == 0:
         trueA = utils.get_and_save_true_area(mandelbrotAnalysisPlatform)
     
-    area_data_set = utils.read_area_series_from_files(mandelbrotAnalysisPlatform)
+    area_data_set = utils.read_area_series_from_files(mandelbrotAnalysisPlatform, store=resultStore)
 
     # Check if data exists for all sampling methods, if not, generate and save it
     if not all(area_data_set[mandelbrotAnalysisPlatform.get_sample_name(sample_type)] for sample_type in [0, 1, 2]):
         print("Data not found, generating and saving data.")
-        utils.save_area_series_into_files(mandelbrotAnalysisPlatform)
-        area_data_set = utils.read_area_series_from_files(mandelbrotAnalysisPlatform)
+        utils.save_area_series_into_files(mandelbrotAnalysisPlatform, n_jobs=mp.cpu_count(), backend="processes", store=resultStore)
+        area_data_set = utils.read_area_series_from_files(mandelbrotAnalysisPlatform, store=resultStore)
 
     # Extract data for plotting
     num_samples_vals1, max_iter_vals1, area_vals1 = zip(*area_data_set["Pure"]) if area_data_set["Pure"] else ([], [], [])
@@ -85,15 +88,19 @@ def run_mset_statistic_and_plot():
     # store the image into a file, if no existing directory, create one
     os.makedirs(mandelbrot_analysis.IMG_CONVERGENCE_DIR, exist_ok=True)
 
+    # the figures are rendered in worker processes, the ones whose data did not change are skipped
+    figures = figure_pipeline.FigurePipeline()
+
     # Generate individual 3D plots
-    utils.plot_individual_3d(num_samples_vals1, max_iter_vals1, area_vals1, 'b', 'o', 'Pure Random Sampling', f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/3D_Diff_pure_random_sampling.png')
-    utils.plot_individual_3d(num_samples_vals2, max_iter_vals2, area_vals2, 'r', '^', 'LHS Sampling', f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/3D_Diff_lhs_sampling.png')
-    utils.plot_individual_3d(num_samples_vals3, max_iter_vals3, area_vals3, 'g', 's', 'Orthogonal Sampling', f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/3D_Diff_orthogonal_sampling.png')
+    figures.add(utils.plot_individual_3d, num_samples_vals1, max_iter_vals1, area_vals1, 'b', 'o', 'Pure Random Sampling', output=f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/3D_Diff_pure_random_sampling.png')
+    figures.add(utils.plot_individual_3d, num_samples_vals2, max_iter_vals2, area_vals2, 'r', '^', 'LHS Sampling', output=f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/3D_Diff_lhs_sampling.png')
+    figures.add(utils.plot_individual_3d, num_samples_vals3, max_iter_vals3, area_vals3, 'g', 's', 'Orthogonal Sampling', output=f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/3D_Diff_orthogonal_sampling.png')
 
     # Generate heatmaps
-    utils.generate_heatmap(max_iter_vals1 , num_samples_vals1, area_vals1, "Heatmap - Pure Random Sampling Area", "Max Iterations", "Number of Samples", f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/heatmap_pure_random_sampling.png')
-    utils.generate_heatmap(max_iter_vals2 , num_samples_vals2, area_vals2, "Heatmap - LHS Sampling Area", "Max Iterations", "Number of Samples", f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/heatmap_lhs_sampling.png')
-    utils.generate_heatmap(max_iter_vals3 , num_samples_vals3, area_vals3, "Heatmap - Orthogonal Sampling Area", "Max Iterations", "Number of Samples", f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/heatmap_orthogonal_sampling.png')
+    figures.add(utils.generate_heatmap, max_iter_vals1 , num_samples_vals1, area_vals1, "Heatmap - Pure Random Sampling Area", "Max Iterations", "Number of Samples", output=f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/heatmap_pure_random_sampling.png')
+    figures.add(utils.generate_heatmap, max_iter_vals2 , num_samples_vals2, area_vals2, "Heatmap - LHS Sampling Area", "Max Iterations", "Number of Samples", output=f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/heatmap_lhs_sampling.png')
+    figures.add(utils.generate_heatmap, max_iter_vals3 , num_samples_vals3, area_vals3, "Heatmap - Orthogonal Sampling Area", "Max Iterations", "Number of Samples", output=f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/heatmap_orthogonal_sampling.png')
+    figures.run(n_jobs=mp.cpu_count())
 
 # -----------------------------------------------------------inverstigate convergence for fixed sample size------------------------------------
 def run_mset_s_and_i_analysis():
@@ -105,7 +112,7 @@ def run_mset_s_and_i_analysis():
     if trueA == 0:
         trueA = utils.get_and_save_true_area(mandelbrotAnalysisPlatform)
     
-    area_data_set = utils.read_area_series_from_files(mandelbrotAnalysisPlatform)
+    area_data_set = utils.read_area_series_from_files(mandelbrotAnalysisPlatform, store=resultStore)
 
     # Extract data for plotting
     num_samples_vals1, max_iter_vals1, area_vals1 = zip(*area_data_set["Pure"]) if area_data_set["Pure"] else ([], [], [])
@@ -118,33 +125,50 @@ def run_mset_s_and_i_analysis():
     area_diff_vals3 = [area - trueA for area in area_vals3]
 
     # Generate convergence plots for each sampling method
-    utils.plot_convergence_curve(num_samples_vals1, max_iter_vals1, area_diff_vals1, 'Pure Random Sampling', f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/pure_random_sampling_convergence')
-    utils.plot_convergence_curve(num_samples_vals2, max_iter_vals2, area_diff_vals2, 'LHS Sampling', f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/lhs_sampling_convergence')
-    utils.plot_convergence_curve(num_samples_vals3, max_iter_vals3, area_diff_vals3, 'Orthogonal Sampling', f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/orthogonal_sampling_convergence')
+    figures = figure_pipeline.FigurePipeline()
+    figures.add(utils.plot_convergence_curve, num_samples_vals1, max_iter_vals1, area_diff_vals1, 'Pure Random Sampling', output=f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/pure_random_sampling_convergence', files=utils.convergence_curve_files(f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/pure_random_sampling_convergence'))
+    figures.add(utils.plot_convergence_curve, num_samples_vals2, max_iter_vals2, area_diff_vals2, 'LHS Sampling', output=f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/lhs_sampling_convergence', files=utils.convergence_curve_files(f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/lhs_sampling_convergence'))
+    figures.add(utils.plot_convergence_curve, num_samples_vals3, max_iter_vals3, area_diff_vals3, 'Orthogonal Sampling', output=f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/orthogonal_sampling_convergence', files=utils.convergence_curve_files(f'{mandelbrot_analysis.IMG_CONVERGENCE_DIR}/orthogonal_sampling_convergence'))
+    figures.run(n_jobs=mp.cpu_count())
 
 
 # -----------------------------------------------------------statistic sample generate---------------------------------------------------------
 def run_statistic_sample_generate():
     if mandelbrotAnalysisPlatform.lib is None:
         mandelbrotAnalysisPlatform._load_library()
-    utils.save_area_series_into_files_with_fix_iter_and_size(mandelbrotAnalysisPlatform)
+    utils.save_area_series_into_files_with_fix_iter_and_size(mandelbrotAnalysisPlatform, n_jobs=mp.cpu_count(), backend="processes", store=resultStore)
     
 
 # -----------------------------------------------------------statistic metrics-----------------------------------------------------------------
 def run_statistic_metric():
-    mean_and_variance = metrics.calculate_mean_and_variance()
+    # only the replicates of the current platform configuration are evaluated
+    config = mandelbrotAnalysisPlatform.get_result_config()
+    labels = ["Pure", "LHS", "Ortho"]
+    replicate_areas = {sample_name: metrics.load_replicate_areas(sample_name, config) for sample_name in labels}
+    if not all(len(areas) > 1 for areas in replicate_areas.values()):
+        print("No replicates of this platform configuration found, run option 5 (statistic sample generate) first.")
+        return
+
+    mean_and_variance = metrics.calculate_mean_and_variance(config)
     print("Mean and Variance:", mean_and_variance)
 
-    mse = metrics.calculate_mse()
+    mse = metrics.calculate_mse(config)
     print("Mean Squared Error (MSE):", mse)
 
-    confidence_intervals = metrics.calculate_confidence_intervals()
+    confidence_intervals = metrics.calculate_confidence_intervals(config)
     print("Confidence Intervals:", confidence_intervals)
-    metrics.plot_confidence_intervals(confidence_intervals)
-    metrics.plot_histograms()
+    print("Variance reduction against pure random sampling:", metrics.calculate_variance_reduction(confidence_intervals))
+
+    # the metrics plots load the replicate areas themselves, so those are hashed as their inputs
+    replicate_areas["trueArea"] = utils.read_area_from_file()
+    os.makedirs(metrics.IMG_STATISTIC_DIR, exist_ok=True)
+    figures = figure_pipeline.FigurePipeline()
+    figures.add(metrics.plot_confidence_intervals, confidence_intervals, output=f'{metrics.IMG_STATISTIC_DIR}/Pure_CI.png', files=[f'{metrics.IMG_STATISTIC_DIR}/{label}_CI.png' for label in labels], pass_output=False, inputs=replicate_areas, config=config)
+    figures.add(metrics.plot_histograms, output=f'{metrics.IMG_STATISTIC_DIR}/histogram_Pure.png', files=[f'{metrics.IMG_STATISTIC_DIR}/histogram_{label}.png' for label in labels], pass_output=False, inputs=replicate_areas, config=config)
 
     # Plot area distributions
-    metrics.plot_area_distributions()
+    figures.add(metrics.plot_area_distributions, output=f'{metrics.IMG_STATISTIC_DIR}/boxplot_mandelbrot_area.png', files=[f'{metrics.IMG_STATISTIC_DIR}/{kind}_mandelbrot_area.png' for kind in ['boxplot', 'violinplot', 'histogram', 'stripplot']], pass_output=False, inputs=replicate_areas, config=config)
+    figures.run(n_jobs=mp.cpu_count())
 
 #------------------------------------------------------------improvement converge--------------------------------------------------------------
 def run_improvement_converge():
@@ -156,23 +180,24 @@ def run_improvement_converge():
     if trueA == 0:
         trueA = utils.get_and_save_true_area(mandelbrotAnalysisPlatform)
     
-    area_data_set = utils.read_area_series_from_files(mandelbrotAnalysisPlatform)
+    area_data_set = utils.read_area_series_from_files(mandelbrotAnalysisPlatform, store=resultStore)
 
     # Check if data exists for all sampling methods, if not, generate and save it
     if not all(area_data_set[mandelbrotAnalysisPlatform.get_sample_name(sample_type)] for sample_type in [0, 1, 2]):
         print("Data not found, generating and saving data.")
-        utils.save_area_series_into_files(mandelbrotAnalysisPlatform)
-        area_data_set = utils.read_area_series_from_files(mandelbrotAnalysisPlatform)
+        utils.save_area_series_into_files(mandelbrotAnalysisPlatform, n_jobs=mp.cpu_count(), backend="processes", store=resultStore)
+        area_data_set = utils.read_area_series_from_files(mandelbrotAnalysisPlatform, store=resultStore)
 
-    plane_area = abs((mandelbrotAnalysisPlatform.real_range[1] - mandelbrotAnalysisPlatform.real_range[0]) * (mandelbrotAnalysisPlatform.imag_range[1] - mandelbrotAnalysisPlatform.imag_range[0]))
     dimension_separate_number = 4
-    partial_area = plane_area / dimension_separate_number**2
     adaptive_num_samples = []
     adaptive_iter_vals = []
     adaptive_areas = []
 
-    try:
-        with open(f'{mandelbrot_analysis.IMG_CONVERGENCE_IMPROVE_DIR}/mandelbrotArea_adaptive.txt', "r") as file:
+    # the text file holds the results of the legacy platform, another config reads them from the result store
+    legacy_config = result_store.is_legacy_config(mandelbrotAnalysisPlatform.get_result_config())
+    adaptive_file = f'{mandelbrot_analysis.IMG_CONVERGENCE_IMPROVE_DIR}/mandelbrotArea_adaptive.txt'
+    if legacy_config and os.path.exists(adaptive_file):
+        with open(adaptive_file, "r") as file:
             print("Reading data from mandelbrotArea_adaptive.txt")
             area_data_set["Adaptive"] = []
             for line in file:
@@ -182,45 +207,51 @@ def run_improvement_converge():
                 adaptive_iter_vals.append(int(max_iter))
                 adaptive_areas.append(float(area))
 
-    except FileNotFoundError:
-        # re create the data set
-        num_samples_list_perfect_root = [500, 800, 1000, 1600, 2000, 2400, 2600, 3000]
-        max_iter_list = [100, 150, 200, 240, 300, 400, 600, 700, 800, 900, 1000]
-        mset_list = list(itertools.product(num_samples_list_perfect_root, max_iter_list))
+    else:
+        # re create the data set, the configurations in the result store are done already
+        mset_list = utils.SWEEP_MSET_LIST
+        config = mandelbrotAnalysisPlatform.get_result_config()
+        completed = resultStore.completed(result_store.SWEEP_EXPERIMENT, "Adaptive", config)
         
         for num_samples_root, max_iter in mset_list:
-            adaptive_area = 0
-            adaptive_samples = mandelbrotAnalysisPlatform.adaptive_sampling(num_samples_root, dimension_separate_number)
-            for adaptive_sample in adaptive_samples:
-                if len(adaptive_sample) == 0:
-                    continue
-                area_partial = mandelbrotAnalysisPlatform.calcu_mandelbrot_area(adaptive_sample, max_iter, partial_area)
-                adaptive_area += area_partial
+            if (num_samples_root**2, max_iter, 0) in completed:
+                continue
+            # the pilot points are evaluated once up to max_iter and count towards their region
+            start_time = time.perf_counter()
+            adaptive_area = mandelbrotAnalysisPlatform.adaptive_area(num_samples_root, dimension_separate_number, max_iter)
+            resultStore.append(result_store.SWEEP_EXPERIMENT, "Adaptive", config, num_samples_root**2, max_iter, round(adaptive_area, 6), elapsed=time.perf_counter() - start_time)
             print(f"Area of the Mandelbrot set with method Adaptive, {num_samples_root**2} samples and {max_iter} max iterations, the area is {round(adaptive_area, 6)}")
-            adaptive_num_samples.append(num_samples_root**2)
-            adaptive_iter_vals.append(max_iter)
-            adaptive_areas.append(round(adaptive_area, 6))
+        stored = resultStore.load(result_store.SWEEP_EXPERIMENT, "Adaptive", config)
+        adaptive_num_samples = stored["num_samples"].tolist()
+        adaptive_iter_vals = stored["max_iter"].tolist()
+        adaptive_areas = stored["area"].tolist()
+        area_data_set["Adaptive"] = list(zip(adaptive_num_samples, adaptive_iter_vals, adaptive_areas))
         # store the image into a file, if no existing directory, create one
         os.makedirs(mandelbrot_analysis.IMG_CONVERGENCE_IMPROVE_DIR, exist_ok=True)
         # Save pure random sampling data to file
-        with open(f'{mandelbrot_analysis.IMG_CONVERGENCE_IMPROVE_DIR}/mandelbrotArea_adaptive.txt', "w") as file:
-            for num_samples, max_iter, area in zip(adaptive_num_samples, adaptive_iter_vals, adaptive_areas):
-                file.write(f"{num_samples} {max_iter} {area:.6f}\n")
+        if legacy_config:
+            with open(adaptive_file, "w") as file:
+                for num_samples, max_iter, area in zip(adaptive_num_samples, adaptive_iter_vals, adaptive_areas):
+                    file.write(f"{num_samples} {max_iter} {area:.6f}\n")
 
     # Calculate differences from alpha
     area_diff_vals = [area - trueA for area in adaptive_areas]
 
+    figures = figure_pipeline.FigurePipeline()
+
     # Generate individual 3D plots
-    utils.plot_individual_3d(adaptive_num_samples, adaptive_iter_vals, adaptive_areas, 'b', 'o', 'Adaptive Sampling', f'{mandelbrot_analysis.IMG_CONVERGENCE_IMPROVE_DIR}/3D_Diff_adaptive_sampling.png')
+    figures.add(utils.plot_individual_3d, adaptive_num_samples, adaptive_iter_vals, adaptive_areas, 'b', 'o', 'Adaptive Sampling', output=f'{mandelbrot_analysis.IMG_CONVERGENCE_IMPROVE_DIR}/3D_Diff_adaptive_sampling.png')
 
     # Generate heatmaps
-    utils.generate_heatmap(adaptive_iter_vals, adaptive_num_samples, adaptive_areas, "Heatmap - Adaptive Sampling Area", "Max Iterations", "Number of Samples", f'{mandelbrot_analysis.IMG_CONVERGENCE_IMPROVE_DIR}/heatmap_adaptive_sampling.png')
+    figures.add(utils.generate_heatmap, adaptive_iter_vals, adaptive_num_samples, adaptive_areas, "Heatmap - Adaptive Sampling Area", "Max Iterations", "Number of Samples", output=f'{mandelbrot_analysis.IMG_CONVERGENCE_IMPROVE_DIR}/heatmap_adaptive_sampling.png')
 
     # Generate convergence plots for each sampling method
-    utils.plot_convergence_curve(adaptive_num_samples, adaptive_iter_vals, area_diff_vals, 'Adaptive Sampling', f'{mandelbrot_analysis.IMG_CONVERGENCE_IMPROVE_DIR}/adaptive_sampling_convergence')
+    figures.add(utils.plot_convergence_curve, adaptive_num_samples, adaptive_iter_vals, area_diff_vals, 'Adaptive Sampling', output=f'{mandelbrot_analysis.IMG_CONVERGENCE_IMPROVE_DIR}/adaptive_sampling_convergence', files=utils.convergence_curve_files(f'{mandelbrot_analysis.IMG_CONVERGENCE_IMPROVE_DIR}/adaptive_sampling_convergence'))
 
     # Compare the convergence of the adaptive sampling method with the other methods
-    utils.plot_convergence_comparison(area_data_set, trueA, f'{mandelbrot_analysis.IMG_CONVERGENCE_IMPROVE_DIR}/improvement')
+    improvement_prefix = f'{mandelbrot_analysis.IMG_CONVERGENCE_IMPROVE_DIR}/improvement'
+    figures.add(utils.plot_convergence_comparison, area_data_set, trueA, output=improvement_prefix, files=utils.convergence_comparison_files(area_data_set, improvement_prefix))
+    figures.run(n_jobs=mp.cpu_count())
 
 # -----------------------------------------------------------main controller process-----------------------------------------------------------
 def main_controller():
@@ -298,5 +329,10 @@ def main_controller():
             print("Invalid choice, please select a valid option.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mandelbrot set area analysis")
+    parser.add_argument("--symmetric", action="store_true", help="sample only the upper half-plane and mirror it")
+    parser.add_argument("--domain", choices=["box", "disk"], default=None, help="sample only the bounding box of the set or the disk |c| <= 2")
+    args = parser.parse_args()
+    mandelbrotAnalysisPlatform = create_platform(args.symmetric, args.domain)
     main_controller()
 
@@ -1,10 +1,13 @@
 import os
 import sys
+import time
 import ctypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.stats import qmc
+from scipy.stats import qmc, norm, t as student_t
 
 #import cupy as cp  # For GPU acceleration
 
@@ -12,11 +15,57 @@ IMG_COLOR_DIR = '../images/color_mandelbrot'
 IMG_CONVERGENCE_DIR = '../images/convergence_analysis'
 IMG_CONVERGENCE_IMPROVE_DIR = '../images/convergence_improvement'
 
+# rough peak memory of the kernels per sample (c, z, index, flags, scratch buffers and the
+# temporaries of the compaction), used to turn a memory budget into a chunk size
+KERNEL_BYTES_PER_SAMPLE = 160
+
+# the set lies inside |c| <= 2 and inside this box (real parts -2 .. 0.472, imaginary parts within +-1.123)
+ESCAPE_RADIUS = 2.0
+MANDELBROT_BOUNDING_BOX = ((-2.0, 0.48), (-1.13, 1.13))
+
+# exact areas of the main cardioid (3 pi / 8) and the period-2 bulb (pi / 16), the control variate of the area
+CARDIOID_AND_BULB_AREA = 7 * np.pi / 16
+
+# sample cap of the anytime estimator when only a target half width is given, an unreachable target stops here
+ANYTIME_MAX_SAMPLES = 2**26
+
+# samples per pixel of the default color_mandelbrot raster, with Poisson scattered samples about e^-8 of the pixels stay empty
+COLOR_SAMPLES_PER_PIXEL = 8
+
+# default number of samples per block of the streaming samplers
+SAMPLE_BLOCK_SIZE = 2**20
+
+# shared library handles of this process by path, every platform (and every platform unpickled
+# in a worker process) loads the library only once
+_LOADED_LIBRARIES = {}
+_LIBRARY_LOCK = threading.Lock()
+
 class MandelbrotAnalysis:
-    def __init__(self, real_range, imag_range):
+    def __init__(self, real_range, imag_range, symmetric=False, domain=None):
         self.real_range = real_range
         self.imag_range = imag_range
+        # the sampled domain: None for the whole plane, "box" for MANDELBROT_BOUNDING_BOX, a box
+        # ((real_min, real_max), (imag_min, imag_max)) or "disk" for |c| <= ESCAPE_RADIUS,
+        # the rest of the plane is outside the set and gets no samples
+        if domain == "box":
+            domain = MANDELBROT_BOUNDING_BOX
+        if domain is not None and domain != "disk" and len(domain) != 2:
+            raise ValueError(f"Unknown domain {domain}, expected None, 'box', 'disk' or ((real_min, real_max), (imag_min, imag_max)).")
+        self.domain = domain
+        # the set is symmetric about the real axis, with a symmetric domain only the upper half is sampled
+        box_imag_range = self._domain_box()[1]
+        self.symmetric = symmetric and (domain == "disk" or box_imag_range[0] == -box_imag_range[1])
         self.lib = None
+        # counters of the last compact kernel run, e.g. how many points exited early
+        self.kernel_stats = {}
+        # optional escape_cache.EscapeCache, used by the area functions for samples with a cache_key
+        self.escape_cache = None
+
+    def __getstate__(self):
+        # a ctypes handle can not be pickled, a worker process loads the library again on first use
+        state = self.__dict__.copy()
+        state["lib"] = None
+        return state
 
     def _load_library(self):
         # combine the path of the shared library
@@ -37,15 +86,20 @@ class MandelbrotAnalysis:
             raise OSError("Unsupported operating system.")
 
         lib_full_path = os.path.join(lib_path, lib_file)
+        with _LIBRARY_LOCK:
+            if lib_full_path not in _LOADED_LIBRARIES:
+                _LOADED_LIBRARIES[lib_full_path] = self._open_library(lib_full_path)
+        self.lib = _LOADED_LIBRARIES[lib_full_path]
 
+    def _open_library(self, lib_full_path):
         # load the shared library
         try:
-            self.lib = ctypes.CDLL(lib_full_path)
+            lib = ctypes.CDLL(lib_full_path)
         except OSError as e:
             raise RuntimeError(f"Unable to load the shared library: {e}")
 
         # define the function signature
-        self.lib.ortho_sampling_generate.argtypes = [
+        lib.ortho_sampling_generate.argtypes = [
             ctypes.c_int,  # major
             ctypes.c_int,  # runs
             ctypes.c_double, #double min_bound_real,
@@ -55,16 +109,110 @@ class MandelbrotAnalysis:
             np.ctypeslib.ndpointer(dtype=np.float64, ndim=1, flags='C_CONTIGUOUS'),  # points_real
             np.ctypeslib.ndpointer(dtype=np.float64, ndim=1, flags='C_CONTIGUOUS')   # points_imag
         ]
-        self.lib.ortho_sampling_generate.restype = None
+        lib.ortho_sampling_generate.restype = None
+
+        # the seeded sampler and the escape time kernel are missing in libraries which were built before they were added
+        if hasattr(lib, "ortho_sampling_generate_seeded"):
+            lib.ortho_sampling_generate_seeded.argtypes = lib.ortho_sampling_generate.argtypes + [
+                ctypes.c_ulong  # seed
+            ]
+            lib.ortho_sampling_generate_seeded.restype = None
+
+        if hasattr(lib, "ortho_sampling_generate_batch"):
+            lib.ortho_sampling_generate_batch.argtypes = [
+                ctypes.c_int,  # major
+                ctypes.c_int,  # runs
+                ctypes.c_double, #double min_bound_real,
+                ctypes.c_double, #double max_bound_real,
+                ctypes.c_double, #double min_bound_imag,
+                ctypes.c_double, #double max_bound_imag,
+                np.ctypeslib.ndpointer(dtype=np.float64, ndim=1, flags='C_CONTIGUOUS'),  # points, interleaved real/imag
+                ctypes.c_ulong,  # seed
+                ctypes.c_int  # num_threads
+            ]
+            lib.ortho_sampling_generate_batch.restype = ctypes.c_int
+
+        if hasattr(lib, "mandelbrot_escape_time"):
+            lib.mandelbrot_escape_time.argtypes = [
+                np.ctypeslib.ndpointer(dtype=np.float64, ndim=1, flags='C_CONTIGUOUS'),  # c_real
+                np.ctypeslib.ndpointer(dtype=np.float64, ndim=1, flags='C_CONTIGUOUS'),  # c_imag
+                ctypes.c_long,  # num_points
+                ctypes.c_int,  # max_iter
+                np.ctypeslib.ndpointer(dtype=np.int32, ndim=1, flags='C_CONTIGUOUS')     # escape_iter
+            ]
+            lib.mandelbrot_escape_time.restype = None
+        return lib
 
     def get_sample_name(self, sample_type):
         sample_name_list = {
             0: "Pure",
             1: "LHS",
-            2: "Ortho"
+            2: "Ortho",
+            3: "Sobol",
+            4: "Halton",
+            5: "ControlVariate",
+            6: "Importance"
         }
         return sample_name_list.get(sample_type, "Unknown")
 
+    def get_sampling_ranges(self):
+        """
+        The ranges the samplers draw from: the domain box (the plane without a domain), its upper half
+        in symmetric mode. For the disk domain these are the (u, v) ranges of the polar map of _to_domain.
+        Output: real_range, imag_range
+        """
+        if self.domain == "disk":
+            return (0, 1), (0, 0.5 if self.symmetric else 1)
+        real_range, imag_range = self._domain_box()
+        if self.symmetric:
+            return real_range, (0, imag_range[1])
+        return real_range, imag_range
+
+    def get_result_config(self, **escape_options):
+        """
+        Everything besides the sample set that changes an area result: the sampling ranges, the domain,
+        the symmetric mode and the kernel options which can move points (the interior check is exact).
+        The escape cache and the result store key their entries with it.
+        Output: tuple (real_range, imag_range, domain, symmetric, result options)
+        """
+        result_options = sorted((name, value) for name, value in escape_options.items() if name != "interior_check")
+        real_range, imag_range = self.get_sampling_ranges()
+        return real_range, imag_range, self.domain, self.symmetric, result_options
+
+    def get_plane_area(self):
+        """
+        The area the inside fraction of the sampled points is multiplied with, the area of the domain.
+        In symmetric mode the fraction in the upper half is the one of the whole domain, so this is
+        twice the sampled area.
+        """
+        if self.domain == "disk":
+            return np.pi * ESCAPE_RADIUS**2
+        real_range, imag_range = self._domain_box()
+        return abs(real_range[1] - real_range[0]) * (imag_range[1] - imag_range[0])
+
+    def _domain_box(self):
+        # the domain box clipped to the plane, the plane itself without a domain
+        if self.domain is None or self.domain == "disk":
+            return self.real_range, self.imag_range
+        (box_real_min, box_real_max), (box_imag_min, box_imag_max) = self.domain
+        real_range = (max(self.real_range[0], box_real_min), min(self.real_range[1], box_real_max))
+        imag_range = (max(self.imag_range[0], box_imag_min), min(self.imag_range[1], box_imag_max))
+        return real_range, imag_range
+
+    def _to_domain(self, samples):
+        # the samplers work in the sampling ranges, for the disk those are (u, v) of the equal area polar map
+        # c = R sqrt(u) exp(2 pi i v), so the strata of LHS and Ortho stay strata of equal area in the disk
+        if self.domain == "disk":
+            radius = ESCAPE_RADIUS * np.sqrt(samples[:, 0])
+            angle = 2 * np.pi * samples[:, 1]
+            samples[:, 0] = radius * np.cos(angle)
+            samples[:, 1] = radius * np.sin(angle)
+        return samples
+
+    def _sampled_area_factor(self):
+        # the region based estimates add up the areas of the sampled regions, this scales them to the plane
+        real_range, imag_range = self.get_sampling_ranges()
+        return self.get_plane_area() / (abs(real_range[1] - real_range[0]) * (imag_range[1] - imag_range[0]))
 
     # Sampling methods
     # with real_range and imag_range as the range of the Mandelbrot set
@@ -75,13 +223,14 @@ class MandelbrotAnalysis:
         Input: expected number of samples
         Output: the x and y coordinates of those samples
         """
+        real_range, imag_range = self.get_sampling_ranges()
         
         # improve the code by using numpy vectorization
         rng = np.random.default_rng()
-        x_samples = rng.uniform(low=self.real_range[0], high=self.real_range[1], size=num_samples)
-        y_samples = rng.uniform(low=self.imag_range[0], high=self.imag_range[1], size=num_samples)
+        x_samples = rng.uniform(low=real_range[0], high=real_range[1], size=num_samples)
+        y_samples = rng.uniform(low=imag_range[0], high=imag_range[1], size=num_samples)
         samples = np.column_stack((x_samples, y_samples))
-        return samples
+        return self._to_domain(samples)
 
     def pure_random_sampling_partial(self, num_samples, real_min, real_max, imag_min, imag_max):
         rng = np.random.default_rng()
@@ -97,17 +246,48 @@ class MandelbrotAnalysis:
         We assume that the number of dimensions is 2 and 
         that we are sampling for each dimension.
         """
+        real_range, imag_range = self.get_sampling_ranges()
         sampler = qmc.LatinHypercube(d=1)
         x_samples = sampler.random(n=num_samples)
         y_samples = sampler.random(n=num_samples)
 
-        x_samples = qmc.scale(x_samples, self.real_range[0], self.real_range[1])
-        y_samples = qmc.scale(y_samples, self.imag_range[0], self.imag_range[1])
+        x_samples = qmc.scale(x_samples, real_range[0], real_range[1])
+        y_samples = qmc.scale(y_samples, imag_range[0], imag_range[1])
 
         samples = np.column_stack((x_samples, y_samples))
-        return samples
+        return self._to_domain(samples)
 
-    def orthogonal_sampling(self, num_samples_root):
+    def sobol_sampling(self, num_samples, seed=None):
+        """
+        Scrambled Sobol sampling. The balance properties only hold for powers of 2, so num_samples
+        is rounded up to the next power of 2 (e.g. 500^2 -> 2^18), the callers use len() of the result.
+        For a design that grows without throwing the evaluated points away use QuasiRandomRefinement.
+        Input: expected number of samples, seed
+        Output: the x and y coordinates of those samples
+        """
+        real_range, imag_range = self.get_sampling_ranges()
+        sampler = qmc.Sobol(d=2, scramble=True, seed=seed)
+        points = sampler.random_base2(m=max(int(num_samples - 1).bit_length(), 0))
+        return self._to_domain(qmc.scale(points, [real_range[0], imag_range[0]], [real_range[1], imag_range[1]]))
+
+    def halton_sampling(self, num_samples, seed=None):
+        """
+        Scrambled Halton sampling, any number of samples.
+        Input: expected number of samples, seed
+        Output: the x and y coordinates of those samples
+        """
+        real_range, imag_range = self.get_sampling_ranges()
+        sampler = qmc.Halton(d=2, scramble=True, seed=seed)
+        return self._to_domain(qmc.scale(sampler.random(n=num_samples), [real_range[0], imag_range[0]], [real_range[1], imag_range[1]]))
+
+    def orthogonal_sampling(self, num_samples_root, seed=None):
+        """
+        Orthogonal sampling with the shared library, num_samples_root^2 samples.
+        Without a seed the library uses its fixed seed 3737, so every call gives the same points.
+        With a seed the generator state is local to the call, different seeds give independent
+        point sets and several calls can run at the same time in threads.
+        """
+        real_range, imag_range = self.get_sampling_ranges()
         major = num_samples_root  # major is the number of samples in each dimension
         num_samples = major * major  # total number of samples
         runs = 1 # number of runs
@@ -117,25 +297,238 @@ class MandelbrotAnalysis:
         points_imag = np.zeros(num_samples, dtype=np.float64)
 
         # call the shared library function to generate the points
-        self.lib.ortho_sampling_generate(major, runs, self.real_range[0], self.real_range[1], self.imag_range[0], self.imag_range[1], points_real, points_imag)
+        self._ortho_sampling_generate(major, runs, real_range[0], real_range[1], imag_range[0], imag_range[1], points_real, points_imag, seed)
 
         # combine the real and imaginary parts to get the samples
         samples = np.column_stack((points_real, points_imag))
 
-        return samples
+        return self._to_domain(samples)
 
-    def orthogonal_sampling_partial(self, num_samples_root, real_min, real_max, imag_min, imag_max):
+    def orthogonal_sampling_partial(self, num_samples_root, real_min, real_max, imag_min, imag_max, seed=None):
         major = num_samples_root
         num_samples = major * major 
         runs = 1
         points_real = np.zeros(num_samples, dtype=np.float64)
         points_imag = np.zeros(num_samples, dtype=np.float64)
-        self.lib.ortho_sampling_generate(major, runs, real_min, real_max, imag_min, imag_max, points_real, points_imag)
+        self._ortho_sampling_generate(major, runs, real_min, real_max, imag_min, imag_max, points_real, points_imag, seed)
         samples = np.column_stack((points_real, points_imag))
         return samples
 
+    def orthogonal_sampling_batch(self, num_samples_root, runs=1, seed=None, num_threads=0, out=None, real_range=None, imag_range=None):
+        """
+        Fast orthogonal sampling for large num_samples_root, several replicates in one call.
+        The points are written straight into one interleaved buffer, no column_stack copy.
+        Input: num_samples_root, number of replicates, seed (None draws a random one),
+               number of threads (0 for all), optional output buffer: float64 of shape (runs, N, 2)
+               or complex128 of shape (runs, N), without the runs axis if runs is 1
+               real_range and imag_range default to the sampling ranges of the platform
+        Output: float64 array of shape (runs, N, 2), or out
+        """
+        if self.lib is None:
+            self._load_library()
+        if not hasattr(self.lib, "ortho_sampling_generate_batch"):
+            raise RuntimeError("The shared library has no batch orthogonal sampler, please rebuild it with CMake.")
+        real_range = self.get_sampling_ranges()[0] if real_range is None else real_range
+        imag_range = self.get_sampling_ranges()[1] if imag_range is None else imag_range
+        if seed is None:
+            seed = np.random.default_rng().integers(2**32)
+
+        num_samples = num_samples_root * num_samples_root
+        if out is None:
+            out = np.empty((runs, num_samples, 2), dtype=np.float64)
+        # a complex128 buffer is the same interleaved layout, the library only sees flat doubles
+        if out.dtype not in (np.float64, np.complex128) or not out.flags['C_CONTIGUOUS']:
+            raise ValueError("The output buffer has to be a C contiguous float64 or complex128 array.")
+        points = out.reshape(-1).view(np.float64)
+        if len(points) != 2 * runs * num_samples:
+            raise ValueError(f"The output buffer holds {len(points) // 2} points, {runs * num_samples} are needed.")
+
+        status = self.lib.ortho_sampling_generate_batch(num_samples_root, runs, real_range[0], real_range[1], imag_range[0], imag_range[1], points, int(seed) & 0xffffffff, num_threads)
+        if status != 0:
+            raise MemoryError(f"The shared library could not allocate the lists for major {num_samples_root}.")
+        self._to_domain(points.reshape(-1, 2))
+        return out
+
+    def _ortho_sampling_generate(self, major, runs, real_min, real_max, imag_min, imag_max, points_real, points_imag, seed=None):
+        if self.lib is None:
+            self._load_library()
+        if seed is None:
+            self.lib.ortho_sampling_generate(major, runs, real_min, real_max, imag_min, imag_max, points_real, points_imag)
+            return
+        if not hasattr(self.lib, "ortho_sampling_generate_seeded"):
+            raise RuntimeError("The shared library has no seeded orthogonal sampler, please rebuild it with CMake.")
+        # MT19937 takes a 32 bit seed
+        self.lib.ortho_sampling_generate_seeded(major, runs, real_min, real_max, imag_min, imag_max, points_real, points_imag, int(seed) & 0xffffffff)
+
+    def pure_random_sampling_blocks(self, num_samples, block_size=SAMPLE_BLOCK_SIZE, seed=None):
+        """
+        Streaming version of pure_random_sampling, yields (block_size, 2) blocks (the last one may be shorter).
+        Only one block is in memory at a time, so num_samples can be far beyond the RAM.
+        Input: expected number of samples, samples per block, seed
+        Output: generator of the x and y coordinates of the samples, block by block
+        """
+        real_range, imag_range = self.get_sampling_ranges()
+        rng = np.random.default_rng(seed)
+        for start in range(0, num_samples, block_size):
+            count = min(block_size, num_samples - start)
+            x_samples = rng.uniform(low=real_range[0], high=real_range[1], size=count)
+            y_samples = rng.uniform(low=imag_range[0], high=imag_range[1], size=count)
+            yield self._to_domain(np.column_stack((x_samples, y_samples)))
+
+    def latin_hypercube_sampling_blocks(self, num_samples, block_size=SAMPLE_BLOCK_SIZE, seed=None):
+        """
+        Streaming version of latin_hypercube_sampling.
+        Sample k sits in the x stratum px(k) and the y stratum py(k), px and py are keyed random
+        permutations of range(num_samples) that are evaluated on the fly, so they are never stored.
+        After the last block every x and every y stratum holds exactly one sample, and every prefix
+        of the stream is a random subset of the strata.
+        Input: expected number of samples, samples per block, seed
+        Output: generator of the x and y coordinates of the samples, block by block
+        """
+        real_range, imag_range = self.get_sampling_ranges()
+        rng = np.random.default_rng(seed)
+        x_key, y_key = rng.integers(2**63, size=2, dtype=np.uint64)
+        real_scale = (real_range[1] - real_range[0]) / num_samples
+        imag_scale = (imag_range[1] - imag_range[0]) / num_samples
+        for start in range(0, num_samples, block_size):
+            index = np.arange(start, min(start + block_size, num_samples), dtype=np.uint64)
+            jitter = rng.random((len(index), 2))
+            x_samples = real_range[0] + (self._keyed_permutation(index, num_samples, x_key) + jitter[:, 0]) * real_scale
+            y_samples = imag_range[0] + (self._keyed_permutation(index, num_samples, y_key) + jitter[:, 1]) * imag_scale
+            yield self._to_domain(np.column_stack((x_samples, y_samples)))
+
+    def orthogonal_sampling_blocks(self, num_samples_root, block_size=SAMPLE_BLOCK_SIZE, seed=None):
+        """
+        Streaming orthogonal sampling with num_samples_root^2 samples, the same design as the library.
+        Every block holds whole major columns (at least one, so block_size is rounded down to a
+        multiple of num_samples_root): sub-square (i, j) gets the minor column i * major + px_i(j)
+        and the minor row j * major + py_j(i), px_i and py_j are keyed random permutations of
+        range(major). Only the 2 * major keys are stored, so the memory does not grow with the
+        number of samples, and after the last block every minor row and column holds one sample.
+        Input: num_samples_root, samples per block, seed
+        Output: generator of the x and y coordinates of the samples, block by block
+        """
+        real_range, imag_range = self.get_sampling_ranges()
+        major = num_samples_root
+        num_samples = major * major
+        rng = np.random.default_rng(seed)
+        column_keys = rng.integers(2**63, size=major, dtype=np.uint64)
+        row_keys = rng.integers(2**63, size=major, dtype=np.uint64)
+        real_scale = (real_range[1] - real_range[0]) / num_samples
+        imag_scale = (imag_range[1] - imag_range[0]) / num_samples
+        columns_per_block = max(1, block_size // major)
+        rows = np.arange(major, dtype=np.uint64)
+
+        for first_column in range(0, major, columns_per_block):
+            columns = np.arange(first_column, min(first_column + columns_per_block, major), dtype=np.uint64)
+            # one line of the grids per column of the block
+            column_grid = np.repeat(columns, major)
+            row_grid = np.tile(rows, len(columns))
+            x_minor = column_grid * np.uint64(major) + self._keyed_permutation(row_grid, major, column_keys[column_grid])
+            y_minor = row_grid * np.uint64(major) + self._keyed_permutation(column_grid, major, row_keys[row_grid])
+
+            jitter = rng.random((len(column_grid), 2))
+            x_samples = real_range[0] + (x_minor + jitter[:, 0]) * real_scale
+            y_samples = imag_range[0] + (y_minor + jitter[:, 1]) * imag_scale
+            yield self._to_domain(np.column_stack((x_samples, y_samples)))
+
+    def _keyed_permutation(self, index, n, keys, rounds=4):
+        """
+        Random permutation of range(n) evaluated at index without building it: a Feistel network
+        on the smallest even number of bits that covers n, values outside range(n) are mapped again
+        (cycle walking) until they land inside. keys is one key or one key per index.
+        Input: uint64 index array with values < n, n, uint64 key(s)
+        Output: uint64 array of the permuted indices
+        """
+        half_bits = max(1, ((int(n) - 1).bit_length() + 1) // 2)
+        half_mask = np.uint64((1 << half_bits) - 1)
+        shift = np.uint64(half_bits)
+        keys = np.broadcast_to(np.asarray(keys, dtype=np.uint64), index.shape)
+
+        value = index.astype(np.uint64)
+        pending = np.arange(len(value))
+        while len(pending):
+            walk = value[pending]
+            walk_keys = keys[pending]
+            for round_index in range(rounds):
+                left, right = walk >> shift, walk & half_mask
+                # splitmix64 finalizer of (right, key, round) as the round function
+                mixed = right + walk_keys + np.uint64(0x9E3779B97F4A7C15 * (round_index + 1) % 2**64)
+                mixed = (mixed ^ (mixed >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+                mixed = (mixed ^ (mixed >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+                mixed = mixed ^ (mixed >> np.uint64(31))
+                walk = (right << shift) | (left ^ (mixed & half_mask))
+            value[pending] = walk
+            pending = pending[walk >= np.uint64(n)]
+        return value
+
     # Mandelbrot set convergence check
-    def mandel_convergence_check_vectorized(self, samples, max_iter):
+    def mandel_convergence_check_vectorized(self, samples, max_iter, kernel="masked", workers=1, chunk_size=None, **escape_options):
+        """
+        Check which samples stay bounded for max_iter iterations.
+        kernel="masked" iterates the whole complex array under a bool mask,
+        kernel="compact" only iterates the points which have not escaped yet.
+        With workers > 1 the samples are split into chunks which run on a thread pool,
+        numpy releases the GIL inside its ufuncs so the chunks really run in parallel.
+        escape_options:
+            interior_check: mark the points in the main cardioid or the period-2 bulb as inside
+                in closed form and only iterate the rest, the mask stays the same
+            periodicity_tol: cycle detection of the compact kernel, see _mandel_compact_kernel
+            backend: "numpy" or "native", the escape time kernel of the shared library,
+                the kernel option is ignored then as the C code stops every point on its own
+            precision: "double" or "single", single iterates in complex64 (compact kernel only)
+            recheck_after: with single precision, the points which stay bounded or escape after
+                this many iterations are iterated again in double precision, None turns it off
+        The counters of the run (interior, outside, periodic, rechecked points) end up in self.kernel_stats.
+        """
+        self._check_kernel_options(kernel, **escape_options)
+        mask = np.empty(len(samples), dtype=bool)
+        stats = {}
+
+        def check_chunk(start, stop):
+            return self._convergence_check_chunk(samples[start:stop], max_iter, kernel, **escape_options)
+
+        for (start, stop), (chunk_mask, chunk_stats) in self._map_chunks(check_chunk, len(samples), chunk_size, None, workers):
+            mask[start:stop] = chunk_mask
+            self._merge_kernel_stats(stats, chunk_stats)
+        self.kernel_stats = stats
+        return mask
+
+    def _check_kernel_options(self, kernel, interior_check=False, periodicity_tol=None, backend="numpy", precision="double", recheck_after=32):
+        if kernel not in ("masked", "compact"):
+            raise ValueError(f"Unknown kernel '{kernel}', expected 'masked' or 'compact'.")
+        if backend not in ("numpy", "native"):
+            raise ValueError(f"Unknown backend '{backend}', expected 'numpy' or 'native'.")
+        if precision not in ("double", "single"):
+            raise ValueError(f"Unknown precision '{precision}', expected 'double' or 'single'.")
+        uses_active_set = kernel == "compact" and backend == "numpy"
+        if periodicity_tol is not None and not uses_active_set:
+            raise ValueError("The periodicity check needs the active set, use kernel='compact' with the numpy backend.")
+        if precision == "single" and not uses_active_set:
+            raise ValueError("Single precision is only available in kernel='compact' with the numpy backend.")
+
+        # load the library here, before any worker thread needs it
+        if backend == "native":
+            if self.lib is None:
+                self._load_library()
+            if not hasattr(self.lib, "mandelbrot_escape_time"):
+                raise RuntimeError("The shared library has no escape time kernel, please rebuild it with CMake.")
+
+    def _convergence_check_chunk(self, samples, max_iter, kernel, interior_check=False, **escape_options):
+        # one chunk of the convergence check, it does not touch self so it is safe to run in threads
+        if kernel == "compact" or escape_options.get("backend") == "native":
+            escape_iter, stats = self._escape_iterations_chunk(samples, max_iter, interior_check, **escape_options)
+            return escape_iter == 0, stats
+
+        if not interior_check:
+            return self._mandel_masked_kernel(samples, max_iter), {"samples": len(samples), "interior": 0}
+
+        interior = self.in_main_cardioid_or_bulb(samples[:, 0], samples[:, 1])
+        mask = np.ones(len(samples), dtype=bool)
+        mask[~interior] = self._mandel_masked_kernel(samples[~interior], max_iter)
+        return mask, {"samples": len(samples), "interior": int(np.count_nonzero(interior))}
+
+    def _mandel_masked_kernel(self, samples, max_iter):
         # complex number array
         c = samples[:, 0] + 1j * samples[:, 1]
         z = np.zeros(c.shape, dtype=np.complex128)
@@ -152,34 +545,514 @@ class MandelbrotAnalysis:
         
         return mask
 
+    def mandel_escape_iterations(self, samples, max_iter, workers=1, chunk_size=None, **escape_options):
+        """
+        Run the active-set kernel and return the escape iteration of every sample.
+        The escape iteration is the first iteration with |z| > 2 (counting from 1),
+        points which stay bounded for all max_iter iterations get 0.
+        So a sample is inside for any threshold m <= max_iter iff its value is 0 or larger than m.
+        The escape_options are the ones of mandel_convergence_check_vectorized,
+        the number of points that exited early is stored in self.kernel_stats.
+        """
+        self._check_kernel_options("compact", **escape_options)
+        escape_iter = np.zeros(len(samples), dtype=self._escape_iter_dtype(max_iter))
+        stats = {}
+
+        def escape_chunk(start, stop):
+            return self._escape_iterations_chunk(samples[start:stop], max_iter, **escape_options)
+
+        for (start, stop), (chunk_escape_iter, chunk_stats) in self._map_chunks(escape_chunk, len(samples), chunk_size, None, workers):
+            escape_iter[start:stop] = chunk_escape_iter
+            self._merge_kernel_stats(stats, chunk_stats)
+        self.kernel_stats = stats
+        return escape_iter
+
+    def _escape_iterations_chunk(self, samples, max_iter, interior_check=False, periodicity_tol=None, backend="numpy", precision="double", recheck_after=32):
+        # points with |c| > 2 escape at the first iteration, z_1 = c, they are classified without iterating,
+        # with interior_check the cardioid and bulb points never escape and keep their 0
+        outside = samples[:, 0] * samples[:, 0] + samples[:, 1] * samples[:, 1] > ESCAPE_RADIUS**2
+        skip = outside | self.in_main_cardioid_or_bulb(samples[:, 0], samples[:, 1]) if interior_check else outside
+        rest = np.flatnonzero(~skip)
+        c_real, c_imag = samples[rest, 0], samples[rest, 1]
+
+        num_rechecked = 0
+        if backend == "native":
+            escape_iter_rest, num_periodic = self._native_escape_kernel(c_real, c_imag, max_iter), 0
+        elif precision == "single":
+            escape_iter_rest, num_periodic = self._mandel_compact_kernel(c_real, c_imag, max_iter, periodicity_tol, np.complex64)
+            if recheck_after is not None:
+                # single precision orbits drift away from the double ones after a few dozen iterations,
+                # the early escapes are safe, the long orbits near the boundary are done again
+                recheck = np.flatnonzero((escape_iter_rest == 0) | (escape_iter_rest > recheck_after))
+                # the periodic points of the first pass are among them, only the second count is final
+                escape_iter_rest[recheck], num_periodic = self._mandel_compact_kernel(c_real[recheck], c_imag[recheck], max_iter, periodicity_tol)
+                num_rechecked = len(recheck)
+        else:
+            escape_iter_rest, num_periodic = self._mandel_compact_kernel(c_real, c_imag, max_iter, periodicity_tol)
+        num_outside = int(np.count_nonzero(outside))
+        stats = {"samples": len(samples), "interior": len(samples) - len(c_real) - num_outside, "outside": num_outside, "periodic": num_periodic, "rechecked": num_rechecked}
+
+        if len(rest) == len(samples):
+            return escape_iter_rest, stats
+        escape_iter = np.zeros(len(samples), dtype=escape_iter_rest.dtype)
+        escape_iter[outside] = 1
+        escape_iter[rest] = escape_iter_rest
+        return escape_iter, stats
+
+    def _native_escape_kernel(self, c_real, c_imag, max_iter):
+        # the C kernel wants contiguous arrays, the columns of the samples are strided
+        c_real = np.ascontiguousarray(c_real, dtype=np.float64)
+        c_imag = np.ascontiguousarray(c_imag, dtype=np.float64)
+        escape_iter = np.empty(len(c_real), dtype=np.int32)
+        self.lib.mandelbrot_escape_time(c_real, c_imag, len(c_real), max_iter, escape_iter)
+        return escape_iter.astype(self._escape_iter_dtype(max_iter))
+
+    def _escape_iter_dtype(self, max_iter):
+        # the smallest unsigned type that can hold max_iter, to keep the escape iterations compact
+        return np.uint16 if max_iter <= np.iinfo(np.uint16).max else np.uint32
+
+    def in_main_cardioid_or_bulb(self, c_real, c_imag):
+        """
+        Closed form test for the two largest components of the Mandelbrot set.
+        main cardioid: q * (q + (x - 1/4)) < y^2 / 4 with q = (x - 1/4)^2 + y^2
+        period-2 bulb: (x + 1)^2 + y^2 < 1/16
+        The boundaries are left out, so only points which are strictly inside get marked.
+        """
+        x_shift = c_real - 0.25
+        imag_sq = c_imag * c_imag
+        q = x_shift * x_shift + imag_sq
+        in_cardioid = q * (q + x_shift) < 0.25 * imag_sq
+        in_bulb = (c_real + 1) ** 2 + imag_sq < 0.0625
+        return in_cardioid | in_bulb
+
+    def _mandel_compact_kernel(self, c_real, c_imag, max_iter, periodicity_tol=None, dtype=np.complex128, compact_ratio=0.125):
+        """
+        Active-set version of the convergence check.
+        The orbits of the live points are updated in place in preallocated buffers and the escape
+        test is |z|^2 > 4 on the split real/imag float views, so no square root and no temporaries.
+        Escaped points are only flagged, once they make up more than compact_ratio of the live set
+        the arrays are compacted together with their index array, so the work per iteration
+        scales with the number of surviving points instead of the number of samples.
+        With periodicity_tol, every orbit is compared with a checkpoint which is refreshed at the
+        iterations 1, 2, 4, 8, ... (Brent), an orbit which comes back within periodicity_tol of its
+        checkpoint is periodic, so it is retired as bounded without running to max_iter.
+        dtype=np.complex64 runs the whole kernel in single precision, half the memory traffic.
+        Input: real and imaginary parts of c, maximal iteration number
+        Output: escape iteration of every point (0 for the points which never escaped)
+                and the number of points which were retired by the periodicity check
+        """
+        num_points = len(c_real)
+        escape_iter = np.zeros(num_points, dtype=self._escape_iter_dtype(max_iter))
+
+        # live set: the position of each live point in the samples and its orbit state
+        # z is squared with the complex ufunc (as in the masked kernel) because numpy may fuse
+        # the real part into a fma, doing it by hand on float arrays would round differently
+        idx = np.arange(num_points)
+        float_dtype = np.float32 if dtype == np.complex64 else np.float64
+        c = np.empty(num_points, dtype=dtype)
+        c.real = c_real
+        c.imag = c_imag
+        z = np.zeros(num_points, dtype=dtype)
+        # retired points, escaped or periodic, which are still waiting for the next compaction
+        retired = np.zeros(num_points, dtype=bool)
+        num_retired = 0
+        num_periodic = 0
+
+        # scratch buffers, the live set only ever shrinks so views of these are enough
+        zr2_buffer = np.empty(num_points, dtype=float_dtype)
+        zi2_buffer = np.empty(num_points, dtype=float_dtype)
+        flag_buffer = np.empty(num_points, dtype=bool)
+
+        check_periodicity = periodicity_tol is not None
+        if check_periodicity:
+            tol_sq = periodicity_tol * periodicity_tol
+            checkpoint = np.zeros(num_points, dtype=dtype)
+            next_checkpoint = 1
+            diff_buffer = np.empty(num_points, dtype=dtype)
+
+        # the escaped points keep iterating until the next compaction and overflow, that is harmless
+        with np.errstate(over='ignore', invalid='ignore'):
+            for iteration in range(1, max_iter + 1):
+                num_live = len(idx)
+                if num_live == 0:
+                    break
+                zr2 = zr2_buffer[:num_live]
+                zi2 = zi2_buffer[:num_live]
+                flag = flag_buffer[:num_live]
+
+                # z = z^2 + c
+                np.square(z, out=z)
+                z += c
+
+                # |z|^2 > 4, excluding the points which were already retired before
+                np.multiply(z.real, z.real, out=zr2)
+                np.multiply(z.imag, z.imag, out=zi2)
+                zr2 += zi2
+                np.greater(zr2, 4.0, out=flag)
+                np.greater(flag, retired, out=flag)
+                num_new = int(np.count_nonzero(flag))
+                if num_new:
+                    escape_iter[idx[flag]] = iteration
+                    retired |= flag
+                    num_retired += num_new
+
+                # |z - checkpoint|^2 < tol^2, the periodic points keep their escape iteration 0
+                if check_periodicity:
+                    diff = diff_buffer[:num_live]
+                    np.subtract(z, checkpoint, out=diff)
+                    np.multiply(diff.real, diff.real, out=zr2)
+                    np.multiply(diff.imag, diff.imag, out=zi2)
+                    zr2 += zi2
+                    np.less(zr2, tol_sq, out=flag)
+                    np.greater(flag, retired, out=flag)
+                    num_new = int(np.count_nonzero(flag))
+                    if num_new:
+                        retired |= flag
+                        num_retired += num_new
+                        num_periodic += num_new
+                    if iteration == next_checkpoint:
+                        checkpoint[:] = z
+                        next_checkpoint *= 2
+
+                # periodic compaction of the live set
+                if num_retired > compact_ratio * num_live:
+                    keep = ~retired
+                    idx, c, z = idx[keep], c[keep], z[keep]
+                    if check_periodicity:
+                        checkpoint = checkpoint[keep]
+                    retired = np.zeros(len(idx), dtype=bool)
+                    num_retired = 0
+
+        return escape_iter, num_periodic
+
     # Calculate the area of the Mandelbrot set
-    def calcu_mandelbrot_area(self, samples, max_iter, plane_area = 16):
-        mask = self.mandel_convergence_check_vectorized(samples, max_iter)
-        area_ratio = np.sum(mask) / len(mask)
+    def calcu_mandelbrot_area(self, samples, max_iter, plane_area = 16, chunk_size=None, memory_budget=None, workers=1, kernel="masked", cache_key=None, **escape_options):
+        """
+        Estimate the area from the fraction of samples inside the Mandelbrot set.
+        With chunk_size (number of samples) or memory_budget (bytes) the samples are checked
+        block by block and only the inside counts are kept, so the kernel intermediates never
+        exist for all samples at once. The result is exactly the one of the full-array path.
+        With workers > 1 the chunks run on a thread pool and the counts are reduced at the end.
+        The samples can also be an iterable of sample blocks, e.g. one of the *_sampling_blocks
+        generators, every block is checked as soon as it is produced.
+        The kernel and escape_options are the ones of mandel_convergence_check_vectorized.
+        With a cache_key (e.g. (sampler, size, seed) of a deterministic sample set) and self.escape_cache
+        the escape iterations are looked up in the cache, see _cached_escape_iterations.
+        """
+        self._check_kernel_options(kernel, **escape_options)
+        if cache_key is not None and self.escape_cache is not None and isinstance(samples, np.ndarray):
+            escape_iter = self._cached_escape_iterations(samples, max_iter, cache_key, workers, chunk_size, **escape_options)
+            return self.area_series_from_escape_iterations(escape_iter, [max_iter], plane_area)[0]
+
+        def count_chunk(block, start, stop):
+            mask, stats = self._convergence_check_chunk(block[start:stop], max_iter, kernel, **escape_options)
+            return np.count_nonzero(mask), stats
+
+        inside = np.int64(0)
+        num_samples = 0
+        stats = {}
+        for block in self._sample_blocks(samples):
+            block_chunks = self._map_chunks(lambda start, stop: count_chunk(block, start, stop), len(block), chunk_size, memory_budget, workers)
+            for _, (chunk_inside, chunk_stats) in block_chunks:
+                inside += chunk_inside
+                self._merge_kernel_stats(stats, chunk_stats)
+            num_samples += len(block)
+        self.kernel_stats = stats
+
+        area_ratio = inside / num_samples
         area = area_ratio * plane_area
         area = round(area, 6)
         return area
 
+    def calcu_mandelbrot_area_series(self, samples, max_iter_list, plane_area = 16, chunk_size=None, memory_budget=None, workers=1, cache_key=None, **escape_options):
+        """
+        Same as calcu_mandelbrot_area, but for a whole list of iteration thresholds at once.
+        The samples are iterated once up to max(max_iter_list) and the escape iterations
+        give the area for every threshold. The samples can be an iterable of sample blocks as well.
+        Output: list of areas in the order of max_iter_list
+        """
+        self._check_kernel_options("compact", **escape_options)
+        top_iter = max(max_iter_list)
+        if cache_key is not None and self.escape_cache is not None and isinstance(samples, np.ndarray):
+            escape_iter = self._cached_escape_iterations(samples, top_iter, cache_key, workers, chunk_size, **escape_options)
+            return self.area_series_from_escape_iterations(escape_iter, max_iter_list, plane_area)
+
+        def histogram_chunk(block, start, stop):
+            escape_iter, stats = self._escape_iterations_chunk(block[start:stop], top_iter, **escape_options)
+            return np.bincount(escape_iter, minlength=top_iter + 1), stats
+
+        escaped_at = np.zeros(top_iter + 1, dtype=np.int64)
+        num_samples = 0
+        stats = {}
+        for block in self._sample_blocks(samples):
+            block_chunks = self._map_chunks(lambda start, stop: histogram_chunk(block, start, stop), len(block), chunk_size, memory_budget, workers)
+            for _, (chunk_escaped_at, chunk_stats) in block_chunks:
+                escaped_at += chunk_escaped_at
+                self._merge_kernel_stats(stats, chunk_stats)
+            num_samples += len(block)
+        self.kernel_stats = stats
+        return self._area_series_from_histogram(escaped_at, num_samples, max_iter_list, plane_area)
+
+    def _cached_escape_iterations(self, samples, max_iter, cache_key, workers=1, chunk_size=None, **escape_options):
+        """
+        Escape iterations of the samples up to max_iter from self.escape_cache. The key is the cache_key
+        of the caller plus the sampling ranges of the platform and the options that can change the result.
+        An entry evaluated up to max_iter or more answers directly (it is read only, memory mapped).
+        An entry with a smaller max_iter only lacks the points which were still bounded, only those are
+        iterated again, then the entry is replaced.
+        kernel_stats counts all the samples, the cached ones and the evaluated ones; the kernel counters
+        (interior, outside, periodic, rechecked) only cover the evaluated points, "partial" says so.
+        Input: samples (array), max_iter, cache_key, workers, chunk_size, escape_options
+        Output: escape iterations in the convention of mandel_escape_iterations
+        """
+        key = self.escape_cache.make_key(cache_key, *self.get_result_config(**escape_options))
+
+        cached, cached_iter = self.escape_cache.load(key)
+        if cached is not None and len(cached) != len(samples):
+            cached = None
+        if cached is not None and cached_iter >= max_iter:
+            # no kernel ran, the stats of the previous call would be stale
+            self.kernel_stats = {"samples": len(samples), "cached": len(samples), "evaluated": 0, "partial": True}
+            return cached
+
+        if cached is None:
+            escape_iter = self.mandel_escape_iterations(samples, max_iter, workers, chunk_size, **escape_options)
+            self.kernel_stats.update({"cached": 0, "evaluated": len(samples), "partial": False})
+        else:
+            # a point that escaped within cached_iter iterations keeps its escape iteration
+            escape_iter = np.array(cached, dtype=self._escape_iter_dtype(max_iter))
+            bounded = np.flatnonzero(cached == 0)
+            # the mapping of the old entry has to be released before store() replaces its file (Windows)
+            del cached
+            escape_iter[bounded] = self.mandel_escape_iterations(samples[bounded], max_iter, workers, chunk_size, **escape_options)
+            # the kernel counters are the ones of the bounded points, the escaped ones were not iterated again
+            self.kernel_stats.update({"samples": len(samples), "cached": len(samples) - len(bounded), "evaluated": len(bounded), "partial": True})
+        self.escape_cache.store(key, escape_iter, max_iter)
+        return escape_iter
+
+    def area_series_from_escape_iterations(self, escape_iter, max_iter_list, plane_area = 16):
+        escaped_at = np.bincount(escape_iter, minlength=max(max_iter_list) + 1)
+        return self._area_series_from_histogram(escaped_at, len(escape_iter), max_iter_list, plane_area)
+
+    def _area_series_from_histogram(self, escaped_at, num_samples, max_iter_list, plane_area):
+        # escaped_at[k] samples escaped at iteration k, so the cumsum counts those which escaped within k iterations
+        escaped_within = np.cumsum(escaped_at[1:])
+
+        areas = []
+        for max_iter in max_iter_list:
+            area_ratio = (num_samples - escaped_within[max_iter - 1]) / num_samples
+            area = area_ratio * plane_area
+            areas.append(round(area, 6))
+        return areas
+
+    def _map_chunks(self, chunk_func, num_samples, chunk_size=None, memory_budget=None, workers=1):
+        """
+        Run chunk_func(start, stop) over consecutive chunks of the samples and yield ((start, stop), result)
+        in sample order. Without chunk_size or memory_budget there is one chunk per worker
+        (a few more with threads, so that uneven chunks balance out), with workers > 1 the chunks
+        run on a thread pool.
+        """
+        if workers < 1:
+            raise ValueError(f"The number of workers has to be at least one, got {workers}.")
+        if chunk_size is None and memory_budget is not None:
+            # every worker holds the intermediates of one chunk at the same time
+            chunk_size = memory_budget // (KERNEL_BYTES_PER_SAMPLE * workers)
+        if chunk_size is None:
+            chunk_size = num_samples if workers == 1 else -(-num_samples // (4 * workers))
+        if chunk_size < 1 and num_samples > 0:
+            raise ValueError(f"The chunk size has to be at least one sample, got {chunk_size}.")
+        chunk_size = max(int(chunk_size), 1)
+
+        bounds = [(start, min(start + chunk_size, num_samples)) for start in range(0, num_samples, chunk_size)]
+        if workers == 1 or len(bounds) <= 1:
+            for start, stop in bounds:
+                yield (start, stop), chunk_func(start, stop)
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            yield from zip(bounds, pool.map(lambda bound: chunk_func(*bound), bounds))
+
+    def _sample_blocks(self, samples):
+        # an (N, 2) array is one block, anything else is an iterable of blocks
+        if isinstance(samples, np.ndarray):
+            yield samples
+        else:
+            yield from samples
+
+    def _merge_kernel_stats(self, total, stats):
+        for key, value in stats.items():
+            total[key] = total.get(key, 0) + value
+
+    def estimate_area_anytime(self, sample_type, max_iter, target_half_width=None, time_budget=None, batch_size=2**16, confidence=0.95, max_samples=None, min_batches=5, seed=None, kernel="compact", workers=1, **escape_options):
+        """
+        Progressive area estimate: draw and evaluate batches of samples until the confidence interval
+        is narrower than target_half_width, the wall clock time_budget (seconds) is used up or
+        max_samples are evaluated, whatever comes first.
+        Pure random samples are independent, so the standard error comes from the running mean and
+        variance of the inside indicator. LHS, Ortho, Sobol and Halton samples are not, every batch is
+        an independent replicate of the design (batch_size samples, a perfect square for Ortho) and
+        the standard error comes from the spread of the replicate areas (Student t interval).
+        The target is only checked after min_batches batches, a handful of replicates gives a noisy spread.
+        With only a target, max_samples defaults to ANYTIME_MAX_SAMPLES, so a target below the noise floor still stops.
+        Input: sample type (0-4), max_iter, stop criteria, batch size, confidence level, seed,
+               kernel, workers and escape_options of mandel_convergence_check_vectorized
+        Output: dict with area, ci (low, high), half_width, num_samples, num_batches, elapsed and stopped_by
+        """
+        if target_half_width is None and time_budget is None and max_samples is None:
+            raise ValueError("Give at least one of target_half_width, time_budget or max_samples.")
+        if time_budget is None and max_samples is None:
+            max_samples = ANYTIME_MAX_SAMPLES
+        if sample_type == 2:
+            batch_root = max(1, int(round(np.sqrt(batch_size))))
+            batch_size = batch_root * batch_root
+        elif sample_type == 3:
+            # Sobol batches are powers of 2
+            batch_size = 2**max(int(batch_size - 1).bit_length(), 0)
+        plane_area = self.get_plane_area()
+        rng = np.random.default_rng(seed)
+
+        start_time = time.perf_counter()
+        num_samples = 0
+        num_inside = 0
+        batch_areas = []
+        stopped_by = None
+        while stopped_by is None:
+            batch_seed = int(rng.integers(2**32))
+            if sample_type == 2:
+                samples = self.orthogonal_sampling(batch_root, seed=batch_seed)
+            elif sample_type == 1:
+                samples = next(self.latin_hypercube_sampling_blocks(batch_size, batch_size, batch_seed))
+            elif sample_type == 3:
+                samples = self.sobol_sampling(batch_size, batch_seed)
+            elif sample_type == 4:
+                samples = self.halton_sampling(batch_size, batch_seed)
+            else:
+                samples = next(self.pure_random_sampling_blocks(batch_size, batch_size, batch_seed))
+            batch_inside = np.count_nonzero(self.mandel_convergence_check_vectorized(samples, max_iter, kernel, workers, **escape_options))
+
+            num_samples += batch_size
+            num_inside += batch_inside
+            batch_areas.append(batch_inside / batch_size * plane_area)
+            area = num_inside / num_samples * plane_area
+
+            if sample_type == 0:
+                # Bernoulli variance of the inside indicator
+                inside_ratio = num_inside / num_samples
+                standard_error = plane_area * np.sqrt(inside_ratio * (1 - inside_ratio) / num_samples)
+                quantile = norm.ppf(0.5 + confidence / 2)
+            elif len(batch_areas) > 1:
+                standard_error = np.std(batch_areas, ddof=1) / np.sqrt(len(batch_areas))
+                quantile = student_t.ppf(0.5 + confidence / 2, len(batch_areas) - 1)
+            else:
+                standard_error, quantile = np.inf, 1.0
+            half_width = quantile * standard_error
+            elapsed = time.perf_counter() - start_time
+
+            if len(batch_areas) >= min_batches and target_half_width is not None and half_width <= target_half_width:
+                stopped_by = "target"
+            elif time_budget is not None and elapsed >= time_budget:
+                stopped_by = "time"
+            elif max_samples is not None and num_samples + batch_size > max_samples:
+                stopped_by = "max_samples"
+
+        return {
+            "area": area,
+            "ci": (area - half_width, area + half_width),
+            "half_width": half_width,
+            "num_samples": num_samples,
+            "num_batches": len(batch_areas),
+            "elapsed": elapsed,
+            "stopped_by": stopped_by,
+        }
+
     # Color the Mandelbrot set with plotting the samples
-    def color_mandelbrot(self, samples, max_iter, sample_type = 1):
+    def color_mandelbrot(self, samples, max_iter, sample_type = 1, render="raster", resolution=None):
+        """
+        Plot the samples colored by escape iteration and store the figure in IMG_COLOR_DIR.
+        render "raster" bins the samples into a resolution-wide image (escape_time_image) and draws it with
+        imshow, so drawing costs the same for any number of samples. Without a resolution the image gets
+        about COLOR_SAMPLES_PER_PIXEL samples per pixel of the sampled domain (counting the mirrored ones
+        in symmetric mode), at most 1024 pixels wide. render "scatter" draws every sample.
+        """
         # check the sampe type
         sample_name = self.get_sample_name(sample_type)
+        num_samples = len(samples)
 
-        # get the mask of the samples that are inside the Mandelbrot set
-        mask = self.mandel_convergence_check_vectorized(samples, max_iter)
-
-        # plot the samples
-        plt.figure(figsize=(10, 10))
-        plt.scatter(samples[mask, 0], samples[mask, 1], color='black', s=0.5, label="Inside Mandelbrot Set")
-        plt.scatter(samples[~mask, 0], samples[~mask, 1], color='red', s=0.5, alpha=0.6, label="Outside Mandelbrot Set")
-        plt.xlabel('Real Axis')
-        plt.ylabel('Imaginary Axis')
-        plt.title(f'Visualization of the Mandelbrot Set ({sample_name} Random Sampling with {len(samples)} Samples and {max_iter} Iterations)')
-        plt.legend()
+        fig, ax = plt.subplots(figsize=(10, 10))
+        if render == "raster":
+            escape_iter = self.mandel_escape_iterations(samples, max_iter)
+            if resolution is None:
+                # the image spans the domain box, the samples (and their conjugates in symmetric mode) cover the domain in it
+                (real_min, real_max), _ = self._domain_box()
+                num_binned = num_samples * (2 if self.symmetric else 1)
+                pixel_size = np.sqrt(COLOR_SAMPLES_PER_PIXEL * self.get_plane_area() / num_binned)
+                resolution = min(1024, max(int((real_max - real_min) / pixel_size), 16))
+            image = self.escape_time_image(samples, escape_iter, max_iter, resolution)
+            (real_min, real_max), (imag_min, imag_max) = self._domain_box()
+            ax.imshow(image, origin="lower", extent=(real_min, real_max, imag_min, imag_max), interpolation="nearest")
+        elif render == "scatter":
+            # get the mask of the samples that are inside the Mandelbrot set
+            mask = self.mandel_convergence_check_vectorized(samples, max_iter)
+
+            # in symmetric mode the samples cover the upper half, the conjugates have the same mask
+            if self.symmetric:
+                samples = np.concatenate((samples, samples * [1, -1]))
+                mask = np.concatenate((mask, mask))
+
+            # plot the samples
+            ax.scatter(samples[mask, 0], samples[mask, 1], color='black', s=0.5, label="Inside Mandelbrot Set")
+            ax.scatter(samples[~mask, 0], samples[~mask, 1], color='red', s=0.5, alpha=0.6, label="Outside Mandelbrot Set")
+            ax.legend()
+        else:
+            plt.close(fig)
+            raise ValueError(f"Unknown render mode '{render}', expected 'raster' or 'scatter'.")
+        ax.set_xlabel('Real Axis')
+        ax.set_ylabel('Imaginary Axis')
+        ax.set_title(f'Visualization of the Mandelbrot Set ({sample_name} Random Sampling with {num_samples} Samples and {max_iter} Iterations)')
         
         # store the image into a file, if no existing directory, create one        
         os.makedirs(IMG_COLOR_DIR, exist_ok=True)
-        plt.savefig(f'{IMG_COLOR_DIR}/mandelbrot_{sample_name}_{len(samples)}_maxIter_{max_iter}.png')
+        fig.savefig(f'{IMG_COLOR_DIR}/mandelbrot_{sample_name}_{num_samples}_maxIter_{max_iter}.png')
+        # the figures of a loop of renders would pile up in pyplot otherwise
+        plt.close(fig)
+
+    def escape_time_image(self, samples, escape_iter, max_iter, resolution=1024, colormap="inferno"):
+        """
+        Bin samples into an RGBA image of the domain box, resolution pixels along the real axis.
+        Escaping samples are colored by log(escape iteration) / log(max_iter), on the upper 80 % of the colormap
+        so the first escapes stay apart from the samples inside, which are black;
+        a pixel is the mean of its samples and pixels without samples stay transparent.
+        In symmetric mode every sample is binned at its conjugate as well.
+        Input: samples, their escape iterations (mandel_escape_iterations), max_iter, resolution, colormap name
+        Output: (height, width, 4) float array, row 0 at the lowest imaginary part
+        """
+        (real_min, real_max), (imag_min, imag_max) = self._domain_box()
+        width = resolution
+        height = max(int(round(resolution * (imag_max - imag_min) / (real_max - real_min))), 1)
+        cols = np.clip(((samples[:, 0] - real_min) / (real_max - real_min) * width).astype(np.int64), 0, width - 1)
+        rows = [np.clip(((samples[:, 1] - imag_min) / (imag_max - imag_min) * height).astype(np.int64), 0, height - 1)]
+        if self.symmetric:
+            rows.append(np.clip(((-samples[:, 1] - imag_min) / (imag_max - imag_min) * height).astype(np.int64), 0, height - 1))
+
+        escaping = escape_iter > 0
+        shade = np.where(escaping, 0.2 + 0.8 * np.log(np.maximum(escape_iter, 1)) / np.log(max(max_iter, 2)), 0.0)
+        count = np.zeros(height * width)
+        escaped = np.zeros(height * width)
+        shade_sum = np.zeros(height * width)
+        for sample_rows in rows:
+            pixels = sample_rows * width + cols
+            count += np.bincount(pixels, minlength=height * width)
+            escaped += np.bincount(pixels, weights=escaping, minlength=height * width)
+            shade_sum += np.bincount(pixels, weights=shade, minlength=height * width)
+
+        # mix the mean color of the escaping samples with black for the share of the inside samples
+        hit = count > 0
+        image = np.zeros((height * width, 4))
+        color = plt.get_cmap(colormap)(np.divide(shade_sum, escaped, out=np.zeros_like(shade_sum), where=escaped > 0))
+        outside_share = np.divide(escaped, count, out=np.zeros_like(escaped), where=hit)
+        image[:, :3] = color[:, :3] * outside_share[:, None]
+        image[:, 3] = hit
+        return image.reshape(height, width, 4)
 
     def compare_sampling_methods(self, num_samples, min_iter, max_iter):
         # Code to test the sampling methods, can be removed later.
@@ -194,39 +1067,58 @@ class MandelbrotAnalysis:
     
     #--------------------------------------------------------------improvement the convergence----------------------------------------------
     def divide_complex_plane(self, dimension_separate_number):
-        real_parts = np.linspace(self.real_range[0], self.real_range[1], dimension_separate_number + 1)
-        imag_parts = np.linspace(self.imag_range[0], self.imag_range[1], dimension_separate_number + 1)
+        real_range, imag_range = self.get_sampling_ranges()
+        real_parts = np.linspace(real_range[0], real_range[1], dimension_separate_number + 1)
+        imag_parts = np.linspace(imag_range[0], imag_range[1], dimension_separate_number + 1)
         regions = []
         for i in range(dimension_separate_number):
             for j in range(dimension_separate_number):
                 regions.append(((real_parts[i], real_parts[i+1]), (imag_parts[j], imag_parts[j+1])))
         return regions
     
+    def pilot_sampling(self, regions, max_iter=100, num_pilot=100, num_repeats=5, pilot_iter=100, seed=None, **escape_options):
+        """
+        Pilot phase of the adaptive sampling for all regions at once: num_repeats batches of num_pilot
+        random points per region go through one kernel call, up to max_iter iterations.
+        The complexity of a region is the variance of its repeat areas at pilot_iter iterations
+        (the areas on the scale of the default plane area 16, like calcu_mandelbrot_area(samples, 100)),
+        computed by a reshape to (regions, repeats, points). The inside count at max_iter is kept,
+        so the pilot points can be folded into the final estimate of the region.
+        Input: list of regions ((real_min, real_max), (imag_min, imag_max)), max_iter, pilot sizes, seed
+        Output: dict with complexities, inside (per region, at max_iter) and num_samples (per region)
+        """
+        bounds = np.array([(real[0], real[1], imag[0], imag[1]) for real, imag in regions], dtype=np.float64).reshape(-1, 4)
+        rng = np.random.default_rng(seed)
+        shape = (len(bounds), num_repeats, num_pilot)
+        x_samples = rng.uniform(bounds[:, 0, None, None], bounds[:, 1, None, None], size=shape)
+        y_samples = rng.uniform(bounds[:, 2, None, None], bounds[:, 3, None, None], size=shape)
+        samples = self._to_domain(np.column_stack((x_samples.ravel(), y_samples.ravel())))
+
+        escape_iter = self.mandel_escape_iterations(samples, max(max_iter, pilot_iter), **escape_options).reshape(shape)
+        inside_pilot = (escape_iter == 0) | (escape_iter > pilot_iter)
+        inside_final = (escape_iter == 0) | (escape_iter > max_iter)
+
+        # calcu_mandelbrot_area with the default plane area of 16, as the repeats were measured before
+        repeat_areas = inside_pilot.mean(axis=2) * 16
+        epsilon = 1e-10
+        return {
+            "complexities": repeat_areas.var(axis=1) + epsilon,
+            "inside": inside_final.sum(axis=(1, 2)),
+            "num_samples": np.full(len(bounds), num_repeats * num_pilot),
+        }
+
     def complexity_measure(self, region):
-        num_repeats = 5
-        areas = []
-        for _ in range(num_repeats):
-            real_range, imag_range = region
-            num_samples_root = 100
-            # use random to check the variance of the area
-            region_samples = self.pure_random_sampling_partial(num_samples_root, real_range[0], real_range[1], imag_range[0], imag_range[1])
-            area = self.calcu_mandelbrot_area(region_samples, 100)
-            areas.append(area)
         # return the variance of the areas
-        epsilon = 1e-10
-        return np.var(areas) + epsilon
+        return self.pilot_sampling([region])["complexities"][0]
 
-    def adaptive_sampling(self, num_samples_root, dimension_separate_number):
+    def adaptive_sampling(self, num_samples_root, dimension_separate_number, pilot=None):
         total_samples_numbers = num_samples_root * num_samples_root
         regions = self.divide_complex_plane(dimension_separate_number)
-        region_complexities = []
-        real_and_imag_parts = []
-
-        for region in regions:
-            real_range, imag_range = region
-            complexity = self.complexity_measure(region)
-            region_complexities.append(complexity)
-            real_and_imag_parts.append((real_range, imag_range))
+        # the pilot phase runs once for all regions, adaptive_area passes in the one it evaluated already
+        if pilot is None:
+            pilot = self.pilot_sampling(regions)
+        region_complexities = pilot["complexities"]
+        real_and_imag_parts = list(regions)
 
         # calculate the weight of each region based on the complexity
         total_complexity = np.sum(region_complexities)
@@ -246,12 +1138,424 @@ class MandelbrotAnalysis:
         # now we have region_complexities, real_and_imag_parts, weights and separate_samples_root with the same index.
         total_samples = []
         for i in range(len(region_complexities)):
-            refined_samples = self.orthogonal_sampling_partial(separate_samples_root[i], real_and_imag_parts[i][0][0], real_and_imag_parts[i][0][1], real_and_imag_parts[i][1][0], real_and_imag_parts[i][1][1])
+            refined_samples = self._to_domain(self.orthogonal_sampling_partial(separate_samples_root[i], real_and_imag_parts[i][0][0], real_and_imag_parts[i][0][1], real_and_imag_parts[i][1][0], real_and_imag_parts[i][1][1]))
             total_samples.append(refined_samples)
 
         # np.concatenate(total_samples)
         return total_samples
 
+    def adaptive_area(self, num_samples_root, dimension_separate_number, max_iter, seed=None, **escape_options):
+        """
+        Area with adaptive sampling. The pilot points are evaluated up to max_iter as well and count
+        towards the estimate of their region, and all refined samples go through one kernel call,
+        the counts per region come from a bincount over the region index of every sample.
+        Input: num_samples_root, dimension_separate_number, max_iter, pilot seed, escape_options
+        Output: the area estimate
+        """
+        regions = self.divide_complex_plane(dimension_separate_number)
+        pilot = self.pilot_sampling(regions, max_iter, seed=seed, **escape_options)
+        region_samples = self.adaptive_sampling(num_samples_root, dimension_separate_number, pilot)
+
+        region_sizes = np.array([len(samples) for samples in region_samples])
+        region_index = np.repeat(np.arange(len(regions)), region_sizes)
+        mask = self.mandel_convergence_check_vectorized(np.concatenate(region_samples), max_iter, kernel="compact", **escape_options)
+        inside = np.bincount(region_index, weights=mask, minlength=len(regions))
+
+        region_areas = np.array([(real[1] - real[0]) * (imag[1] - imag[0]) for real, imag in regions])
+        area_ratios = (pilot["inside"] + inside) / (pilot["num_samples"] + region_sizes)
+        return round(float(np.sum(area_ratios * region_areas) * self._sampled_area_factor()), 6)
+
+    def quadtree_adaptive_area(self, num_samples, max_iter, dimension_separate_number=4, pilot_samples=64, max_depth=6, pilot_fraction=0.3, defensive_fraction=0.1, seed=None, **escape_options):
+        """
+        Multi-level adaptive area. Every open cell is topped up to pilot_samples random points (one kernel
+        call per level, the points of a split cell are handed down to its four children). Cells whose pilot
+        points are all inside or all outside are closed, cells with both are split (the ones with the largest
+        area * standard deviation first) while the pilot phase stays within pilot_fraction of num_samples
+        and max_depth is not reached. The rest of the budget is drawn fresh in the leaves: the closed ones
+        get only defensive_fraction of it, the boundary leaves the remainder in proportion to
+        area * standard deviation (Neyman allocation). The variance is the stratified one of the leaves.
+        num_samples is a hard cap as long as it covers the first pilot level and one fresh point per leaf;
+        a smaller budget is exceeded by those minimums, the dict reports the evaluations actually used.
+        Input: number of samples (kernel evaluations), max_iter, initial grid size, pilot size per cell,
+               max_depth, pilot_fraction, defensive_fraction, seed, escape_options of mandel_convergence_check_vectorized
+        Output: dict with area, variance, std_error, num_samples (used), budget_exceeded, num_leaves, num_boundary_leaves and depth
+        """
+        rng = np.random.default_rng(seed)
+        bounds = np.array([(real[0], real[1], imag[0], imag[1]) for real, imag in self.divide_complex_plane(dimension_separate_number)])
+        depth = 0
+        points = np.empty((0, 2))
+        points_inside = np.empty(0, dtype=bool)
+        points_cell = np.empty(0, dtype=np.int64)
+        used = 0
+        leaf_bounds, leaf_inside, leaf_count = [], [], []
+
+        def draw_and_check(cell_bounds, cell_index, counts):
+            # uniform points in the given cells, all of them through one kernel call
+            sample_cell = np.repeat(cell_index, counts)
+            cell = cell_bounds[sample_cell]
+            samples = np.column_stack((rng.uniform(cell[:, 0], cell[:, 1]), rng.uniform(cell[:, 2], cell[:, 3])))
+            # the cells live in the sampling ranges, only the kernel sees the points in the plane
+            mask = self.mandel_convergence_check_vectorized(self._to_domain(samples.copy()), max_iter, kernel="compact", **escape_options)
+            return samples, mask, sample_cell
+
+        while len(bounds):
+            num_cells = len(bounds)
+            top_up = np.maximum(pilot_samples - np.bincount(points_cell, minlength=num_cells), 0)
+            new_points, new_inside, new_cell = draw_and_check(bounds, np.arange(num_cells), top_up)
+            used += len(new_points)
+            points = np.concatenate((points, new_points))
+            points_inside = np.concatenate((points_inside, new_inside))
+            points_cell = np.concatenate((points_cell, new_cell))
+
+            inside = np.bincount(points_cell, weights=points_inside, minlength=num_cells)
+            count = np.bincount(points_cell, minlength=num_cells)
+            mixed = (inside > 0) & (inside < count)
+
+            # a split costs about three pilots, every child inherits a quarter of the parent's points
+            split = np.zeros(num_cells, dtype=bool)
+            if depth < max_depth:
+                cell_areas = (bounds[:, 1] - bounds[:, 0]) * (bounds[:, 3] - bounds[:, 2])
+                ratio = inside / count
+                priority = np.where(mixed, cell_areas * np.sqrt(ratio * (1 - ratio)), -1.0)
+                affordable = int(max(pilot_fraction * num_samples - used, 0) // (3 * pilot_samples))
+                candidates = np.argsort(-priority)[:min(affordable, np.count_nonzero(mixed))]
+                split[candidates] = True
+
+            leaf_bounds.append(bounds[~split])
+            leaf_inside.append(inside[~split])
+            leaf_count.append(count[~split])
+
+            # children in the order (low real, low imag), (low real, high imag), (high real, low imag), (high real, high imag)
+            parents = bounds[split]
+            mid_real = (parents[:, 0] + parents[:, 1]) / 2
+            mid_imag = (parents[:, 2] + parents[:, 3]) / 2
+            children = []
+            for high_real in (False, True):
+                for high_imag in (False, True):
+                    real_low = np.where(high_real, mid_real, parents[:, 0])
+                    real_high = np.where(high_real, parents[:, 1], mid_real)
+                    imag_low = np.where(high_imag, mid_imag, parents[:, 2])
+                    imag_high = np.where(high_imag, parents[:, 3], mid_imag)
+                    children.append(np.column_stack((real_low, real_high, imag_low, imag_high)))
+            bounds = np.stack(children, axis=1).reshape(-1, 4)
+
+            # hand the points of the split cells down to the children
+            split_rank = np.cumsum(split) - 1
+            keep = split[points_cell]
+            points, points_inside = points[keep], points_inside[keep]
+            parent = points_cell[keep]
+            quadrant = 2 * (points[:, 0] >= mid_real[split_rank[parent]]) + (points[:, 1] >= mid_imag[split_rank[parent]])
+            points_cell = 4 * split_rank[parent] + quadrant
+            depth += 1
+
+        leaf_bounds = np.concatenate(leaf_bounds)
+        leaf_inside = np.concatenate(leaf_inside)
+        leaf_count = np.concatenate(leaf_count)
+        leaf_areas = (leaf_bounds[:, 1] - leaf_bounds[:, 0]) * (leaf_bounds[:, 3] - leaf_bounds[:, 2])
+        boundary = (leaf_inside > 0) & (leaf_inside < leaf_count)
+
+        # the pilot points decided where to split, estimating from them as well would bias the area
+        # (a closed cell is one whose pilot missed the boundary), so the estimate uses fresh points only:
+        # the closed leaves share defensive_fraction of the rest of the budget by area (at least one point
+        # each), the boundary leaves get the remainder in proportion to area * standard deviation (Neyman)
+        remaining = max(num_samples - used, len(leaf_bounds))
+        ratio = leaf_inside / leaf_count
+        allocation = np.ones(len(leaf_bounds), dtype=np.int64)
+        closed_areas = np.where(boundary, 0.0, leaf_areas)
+        neyman_weights = np.where(boundary, leaf_areas * np.sqrt(ratio * (1 - ratio)), 0.0)
+        closed_budget = remaining if neyman_weights.sum() == 0 else defensive_fraction * remaining
+        if closed_areas.sum() > 0:
+            allocation = np.maximum(allocation, np.floor(closed_budget * closed_areas / closed_areas.sum()).astype(np.int64))
+        if neyman_weights.sum() > 0:
+            boundary_budget = max(remaining - allocation[~boundary].sum(), 0)
+            allocation[boundary] = np.maximum(1, np.floor(boundary_budget * neyman_weights[boundary] / neyman_weights.sum()).astype(np.int64))
+        # the minimum of one point per leaf can push the total over the budget, take the excess from the largest allocations
+        excess = allocation.sum() - remaining
+        if excess > 0:
+            order = np.argsort(-allocation, kind="stable")
+            reducible = allocation[order] - 1
+            allocation[order] -= np.minimum(reducible, np.maximum(excess - (np.cumsum(reducible) - reducible), 0))
+
+        _, leaf_inside, leaf_cell = draw_and_check(leaf_bounds, np.arange(len(leaf_bounds)), allocation)
+        used += len(leaf_cell)
+        ratio = np.bincount(leaf_cell, weights=leaf_inside, minlength=len(leaf_bounds)) / allocation
+        area_factor = self._sampled_area_factor()
+        area = np.sum(leaf_areas * ratio) * area_factor
+        # a leaf whose fresh points are all on one side adds no variance, so this is a lower estimate
+        variance = np.sum(leaf_areas**2 * ratio * (1 - ratio) / allocation) * area_factor**2
+        return {
+            "area": area,
+            "variance": variance,
+            "std_error": np.sqrt(variance),
+            "num_samples": used,
+            "budget_exceeded": used > num_samples,
+            "num_leaves": len(leaf_bounds),
+            "num_boundary_leaves": int(np.count_nonzero(boundary)),
+            "depth": depth,
+        }
+
+    def boundary_refined_area(self, max_iter, resolution=2**12, initial_cell=2**6, boundary_subsamples=4, workers=1, **escape_options):
+        """
+        Deterministic area on a pixel raster of the domain box clipped to the bounding box (outside of it
+        there is no point of the set; the bounding box for the disk domain), its upper half in symmetric mode,
+        Mariani-Silver style. The raster is cut into cells of initial_cell pixels; only the border pixels
+        of a cell are evaluated. A cell whose border pixels all have the same escape iteration is filled
+        with it without evaluating its interior (all bounded: the set is full, so the cell is inside;
+        all escaping at the same iteration: no part of the connected set can reach into it).
+        The other cells are split into four, down to single pixels, so only the cells which cross the
+        boundary get evaluated at the target resolution.
+        A pixel counts with its center, except the boundary pixels (the ones with a neighbour of the other
+        class): they count with the bounded fraction of a boundary_subsamples x boundary_subsamples grid of
+        points in them, which removes most of the error of the raster.
+        lower and upper leave the boundary pixels out or add them whole. They are only a crude envelope of
+        the raster (a narrow feature can fall between pixel centers) and both are for the set of the points
+        bounded for max_iter iterations, which is larger than the Mandelbrot set (truncation bias).
+        Input: max_iter, pixels along the real axis, initial cell size (powers of two), sub-pixel grid
+               of the boundary pixels (1 to count them by their center), workers, escape_options of mandel_escape_iterations
+        Output: dict with area, lower, upper, pixel_size, num_pixels, num_boundary_pixels and num_evaluated
+        """
+        if resolution % initial_cell or initial_cell & (initial_cell - 1):
+            raise ValueError("initial_cell has to be a power of two which divides the resolution.")
+        if boundary_subsamples < 1:
+            raise ValueError(f"boundary_subsamples has to be at least one, got {boundary_subsamples}.")
+        (real_min, real_max), (imag_min, imag_max) = MANDELBROT_BOUNDING_BOX
+        if self.domain != "disk":
+            (box_real_min, box_real_max), (box_imag_min, box_imag_max) = self._domain_box()
+            real_min, real_max = max(real_min, box_real_min), min(real_max, box_real_max)
+            imag_min, imag_max = max(imag_min, box_imag_min), min(imag_max, box_imag_max)
+        if self.symmetric:
+            imag_min = 0.0
+        if real_max <= real_min or imag_max <= imag_min:
+            raise ValueError("The domain does not overlap the bounding box of the set.")
+        pixel_size = (real_max - real_min) / resolution
+        width = resolution
+        height = -(-int(np.ceil((imag_max - imag_min) / pixel_size)) // initial_cell) * initial_cell
+        # -1 is a pixel which was not evaluated, else its escape iteration (0 for bounded)
+        dwell = np.full((height, width), -1, dtype=np.int32)
+        filled_inside = np.zeros((height, width), dtype=bool)
+
+        cell_size = initial_cell
+        cell_rows, cell_cols = np.meshgrid(np.arange(0, height, cell_size), np.arange(0, width, cell_size), indexing="ij")
+        cell_rows, cell_cols = cell_rows.ravel(), cell_cols.ravel()
+        num_evaluated = 0
+        while len(cell_rows):
+            # border pixels of a cell of cell_size, relative to its corner
+            edge = np.arange(cell_size)
+            side = np.arange(1, cell_size - 1)
+            offset_rows = np.concatenate((np.zeros(cell_size, dtype=np.int64), np.full(cell_size, cell_size - 1), side, side))
+            offset_cols = np.concatenate((edge, edge, np.zeros(len(side), dtype=np.int64), np.full(len(side), cell_size - 1)))
+            if cell_size == 1:
+                offset_rows, offset_cols = offset_rows[:1], offset_cols[:1]
+            rows = cell_rows[:, None] + offset_rows
+            cols = cell_cols[:, None] + offset_cols
+
+            # all the pixels of the level which were not evaluated before go through one kernel call
+            pixels = np.unique(rows * width + cols)
+            pixels = pixels[dwell.flat[pixels] < 0]
+            if len(pixels):
+                pixel_rows, pixel_cols = np.divmod(pixels, width)
+                samples = np.column_stack((real_min + (pixel_cols + 0.5) * pixel_size, imag_min + (pixel_rows + 0.5) * pixel_size))
+                dwell.flat[pixels] = self.mandel_escape_iterations(samples, max_iter, workers=workers, **escape_options)
+                num_evaluated += len(pixels)
+
+            border = dwell[rows, cols]
+            uniform = np.all(border == border[:, :1], axis=1)
+            # the uniform cells which are inside are filled, the evaluated pixels keep their own dwell
+            fill = uniform & (border[:, 0] == 0)
+            if np.any(fill) and cell_size > 2:
+                fill_grid = np.zeros((height // cell_size, width // cell_size), dtype=bool)
+                fill_grid[cell_rows[fill] // cell_size, cell_cols[fill] // cell_size] = True
+                filled_inside |= np.repeat(np.repeat(fill_grid, cell_size, axis=0), cell_size, axis=1)
+
+            # the cells of 2x2 pixels or less have no interior, every pixel of them is evaluated by now
+            split = ~uniform & (cell_size > 2)
+            cell_size //= 2
+            cell_rows = (cell_rows[split][:, None] + np.array([0, 0, cell_size, cell_size])).ravel()
+            cell_cols = (cell_cols[split][:, None] + np.array([0, cell_size, 0, cell_size])).ravel()
+
+        # the rows which pad the raster to whole cells lie above the box and are not part of the area
+        row_centers = imag_min + (np.arange(height) + 0.5) * pixel_size
+        in_box = (row_centers <= imag_max)[:, None]
+        inside = (filled_inside | (dwell == 0)) & in_box
+        # pixels with a neighbour of the other class, the rows below the real axis mirror the first row
+        padded = np.pad(inside, 1, mode="constant")
+        if self.symmetric:
+            padded[0, 1:-1] = inside[0]
+        any_inside = np.zeros_like(inside)
+        all_inside = np.ones_like(inside)
+        for row_shift in range(3):
+            for col_shift in range(3):
+                neighbour = padded[row_shift:row_shift + height, col_shift:col_shift + width]
+                any_inside |= neighbour
+                all_inside &= neighbour
+        boundary = any_inside & ~all_inside & in_box
+
+        # the boundary pixels count with the bounded fraction of a sub-pixel grid
+        boundary_rows, boundary_cols = np.nonzero(boundary)
+        if boundary_subsamples > 1:
+            offsets = (np.arange(boundary_subsamples) + 0.5) / boundary_subsamples
+            sub_real = real_min + (boundary_cols[:, None, None] + offsets[None, None, :]) * pixel_size
+            sub_imag = imag_min + (boundary_rows[:, None, None] + offsets[None, :, None]) * pixel_size
+            sub_real, sub_imag = np.broadcast_arrays(sub_real, sub_imag)
+            subsamples = np.column_stack((sub_real.ravel(), sub_imag.ravel()))
+            sub_inside = self.mandel_escape_iterations(subsamples, max_iter, workers=workers, **escape_options) == 0
+            boundary_inside = np.count_nonzero(sub_inside) / boundary_subsamples**2
+            num_evaluated += len(subsamples)
+        else:
+            boundary_inside = np.count_nonzero(inside[boundary_rows, boundary_cols])
+
+        pixel_area = pixel_size**2 * (2 if self.symmetric else 1)
+        return {
+            "area": (np.count_nonzero(inside & ~boundary) + boundary_inside) * pixel_area,
+            "lower": np.count_nonzero(inside & ~boundary) * pixel_area,
+            "upper": np.count_nonzero(inside | boundary) * pixel_area,
+            "pixel_size": pixel_size,
+            "num_pixels": height * width,
+            "num_boundary_pixels": len(boundary_rows),
+            "num_evaluated": num_evaluated,
+        }
+
+    def control_variate_area(self, samples, max_iter, plane_area = 16, chunk_size=None, **escape_options):
+        """
+        Area from the hit fraction with the main cardioid and period-2 bulb as control variate.
+        Their area is known exactly (CARDIOID_AND_BULB_AREA) and they are part of the set, so the
+        hits inside them only add noise: the estimate is mean(inside) - beta * (mean(in_cardioid_or_bulb) - known fraction)
+        with the variance minimizing beta = cov(inside, in_cardioid_or_bulb) / var(in_cardioid_or_bulb).
+        Input: samples (uniform in the domain, like calcu_mandelbrot_area), max_iter, plane_area,
+               chunk_size (bounds the kernel memory), escape_options
+        Output: dict with area, variance (of the estimate), variance_per_sample, variance_reduction
+                (against the plain hit fraction of the same samples) and num_samples
+        """
+        inside = self.mandel_convergence_check_vectorized(samples, max_iter, kernel="compact", chunk_size=chunk_size, **escape_options).astype(np.float64)
+        control = self.in_main_cardioid_or_bulb(samples[:, 0], samples[:, 1]).astype(np.float64)
+        control_mean = CARDIOID_AND_BULB_AREA / plane_area
+        control_variance = np.var(control, ddof=1)
+        beta = np.cov(inside, control)[0, 1] / control_variance if control_variance > 0 else 0.0
+        adjusted = inside - beta * (control - control_mean)
+        variance_per_sample = np.var(adjusted, ddof=1) * plane_area**2
+        plain_variance_per_sample = np.var(inside, ddof=1) * plane_area**2
+        return {
+            "area": np.mean(adjusted) * plane_area,
+            "variance": variance_per_sample / len(samples),
+            "variance_per_sample": variance_per_sample,
+            "variance_reduction": plain_variance_per_sample / variance_per_sample if variance_per_sample > 0 else np.inf,
+            "beta": beta,
+            "num_samples": len(samples),
+        }
+
+    def importance_sampling_area(self, num_samples, max_iter, grid_size=64, pilot_per_cell=4, pilot_iter=100, boundary_iter=8, defensive_fraction=0.2, seed=None, chunk_size=None, **escape_options):
+        """
+        Area by importance sampling with a proposal concentrated near the boundary.
+        A coarse escape-time pilot (pilot_per_cell random points per cell of a grid_size x grid_size grid of
+        the sampling ranges, up to pilot_iter) marks the cells near the boundary: the ones with hits or with
+        points escaping after boundary_iter iterations. The proposal is the mixture of defensive_fraction
+        uniform and the rest on the marked cells in proportion to the square root of their smoothed hit
+        fraction, so every weight (uniform density / proposal density) is at most 1 / defensive_fraction.
+        The main cardioid and period-2 bulb are added with their exact area and only the rest of the set is
+        estimated, so the cells inside them cost no variance.
+        Input: number of samples (without the pilot), max_iter, grid size, pilot sizes, defensive_fraction,
+               seed, chunk_size (bounds the kernel memory), escape_options of mandel_escape_iterations
+        Output: dict with area, variance (of the estimate), variance_per_sample, variance_reduction
+                (against the plain hit fraction with as many samples), num_samples and num_pilot
+        """
+        rng = np.random.default_rng(seed)
+        (real_min, real_max), (imag_min, imag_max) = self.get_sampling_ranges()
+        cell_width = (real_max - real_min) / grid_size
+        cell_height = (imag_max - imag_min) / grid_size
+        num_cells = grid_size * grid_size
+
+        def draw(cell_index):
+            # uniform points in the given cells (row major, real index first), in the sampling ranges
+            real_index, imag_index = np.divmod(cell_index, grid_size)
+            samples = np.column_stack((real_min + (real_index + rng.random(len(cell_index))) * cell_width,
+                                       imag_min + (imag_index + rng.random(len(cell_index))) * cell_height))
+            return self._to_domain(samples)
+
+        # pilot: the hits of the rest of the set per cell, late escapes mark the cells close to it
+        pilot_cells = np.repeat(np.arange(num_cells), pilot_per_cell)
+        pilot_samples = draw(pilot_cells)
+        pilot_iter_values = self.mandel_escape_iterations(pilot_samples, pilot_iter, **escape_options)
+        pilot_rest = (pilot_iter_values == 0) & ~self.in_main_cardioid_or_bulb(pilot_samples[:, 0], pilot_samples[:, 1])
+        pilot_hits = np.bincount(pilot_cells, weights=pilot_rest, minlength=num_cells)
+        pilot_late = np.bincount(pilot_cells, weights=pilot_iter_values > boundary_iter, minlength=num_cells)
+
+        # the variance of the weighted hits is smallest for a proposal proportional to sqrt(hit fraction),
+        # the fraction is smoothed (hits + 1/2) / (n + 1) in the cells that are near the boundary
+        near_boundary = (pilot_hits > 0) | (pilot_late > 0)
+        proposal = np.full(num_cells, 1 / num_cells)
+        if np.any(near_boundary):
+            boundary_weights = np.where(near_boundary, np.sqrt((pilot_hits + 0.5) / (pilot_per_cell + 1)), 0.0)
+            proposal = defensive_fraction * proposal + (1 - defensive_fraction) * boundary_weights / boundary_weights.sum()
+        cells = rng.choice(num_cells, size=num_samples, p=proposal)
+        samples = draw(cells)
+
+        # only the part of the set outside the cardioid and bulb is estimated
+        inside = self.mandel_convergence_check_vectorized(samples, max_iter, kernel="compact", chunk_size=chunk_size, **escape_options)
+        rest = inside & ~self.in_main_cardioid_or_bulb(samples[:, 0], samples[:, 1])
+        plane_area = self.get_plane_area()
+        weighted = rest * (1 / num_cells) / proposal[cells] * plane_area
+        area = CARDIOID_AND_BULB_AREA + np.mean(weighted)
+        variance_per_sample = np.var(weighted, ddof=1)
+        ratio = area / plane_area
+        plain_variance_per_sample = ratio * (1 - ratio) * plane_area**2
+        return {
+            "area": area,
+            "variance": variance_per_sample / num_samples,
+            "variance_per_sample": variance_per_sample,
+            "variance_reduction": plain_variance_per_sample / variance_per_sample if variance_per_sample > 0 else np.inf,
+            "num_samples": num_samples,
+            "num_pilot": len(pilot_cells),
+        }
+
+class QuasiRandomRefinement:
+    """
+    Scrambled Sobol (sample type 3) or Halton (sample type 4) design that grows in place.
+    The sequences are extensible, the first n points of a larger design are the design of size n,
+    so refine() only draws and evaluates the points which are new and adds their escape iterations
+    to the histogram of the points evaluated before. Going from 2^k to 2^(k+1) samples costs the new half.
+    """
+    def __init__(self, platform, max_iter, sample_type=3, seed=None, plane_area=None, **escape_options):
+        if sample_type == 3:
+            self.sampler = qmc.Sobol(d=2, scramble=True, seed=seed)
+        elif sample_type == 4:
+            self.sampler = qmc.Halton(d=2, scramble=True, seed=seed)
+        else:
+            raise ValueError(f"Sample type {sample_type} is not extensible, expected 3 (Sobol) or 4 (Halton).")
+        platform._check_kernel_options("compact", **escape_options)
+        self.platform = platform
+        self.sample_name = platform.get_sample_name(sample_type)
+        self.max_iter = max_iter
+        self.escape_options = escape_options
+        if plane_area is None:
+            plane_area = platform.get_plane_area()
+        self.plane_area = plane_area
+        # escaped_at[k] points escaped at iteration k, escaped_at[0] stayed bounded
+        self.escaped_at = np.zeros(max_iter + 1, dtype=np.int64)
+        self.num_samples = 0
+
+    def refine(self, num_samples, workers=1, chunk_size=None):
+        """
+        Extend the design to num_samples points in total, only the new points are evaluated.
+        Input: total number of samples (powers of 2 for Sobol), workers and chunk_size of the kernel
+        Output: the area estimate with all num_samples points
+        """
+        if num_samples < self.num_samples:
+            raise ValueError(f"The design already has {self.num_samples} points, it can not shrink to {num_samples}.")
+        new_points = self.sampler.random(n=num_samples - self.num_samples)
+        real_range, imag_range = self.platform.get_sampling_ranges()
+        new_samples = self.platform._to_domain(qmc.scale(new_points, [real_range[0], imag_range[0]], [real_range[1], imag_range[1]]))
+        escape_iter = self.platform.mandel_escape_iterations(new_samples, self.max_iter, workers, chunk_size, **self.escape_options)
+        self.escaped_at += np.bincount(escape_iter, minlength=self.max_iter + 1)
+        self.num_samples = num_samples
+        return self.area()
+
+    def area(self, max_iter=None):
+        # any threshold up to the max_iter of the refinement comes from the same histogram
+        max_iter = self.max_iter if max_iter is None else max_iter
+        if max_iter > self.max_iter:
+            raise ValueError(f"The points are evaluated up to {self.max_iter} iterations, max_iter {max_iter} is larger.")
+        return self.platform._area_series_from_histogram(self.escaped_at, self.num_samples, [max_iter], self.plane_area)[0]
+
 if __name__ == "__main__":
     mandelbrot = MandelbrotAnalysis(real_range=(-2, 1), imag_range=(-1.5, 1.5))
     num_samples = 1000
@@ -4,6 +4,7 @@ import utils
 import matplotlib.pyplot as plt
 import seaborn as sns
 import os
+import result_store
 
 IMG_STATISTIC_DIR = '../images/statistic_analysis'
 
@@ -24,11 +25,25 @@ def load_area_data(file_path):
         print(f"File {file_path} not found.")
     return np.array(areas)
 
+# Load the replicate areas of one sampling method, from the result store if it has them, else from the text file
+# config is the platform configuration (MandelbrotAnalysis.get_result_config) the replicates were generated with,
+# None is the legacy whole plane platform; the text files only hold its results, for another config they count as missing
+def load_replicate_areas(sample_name, config=None):
+    if config is None:
+        config = result_store.LEGACY_CONFIG
+    if os.path.exists(result_store.RESULT_STORE_PATH):
+        areas = result_store.ResultStore().load(result_store.REPLICATE_EXPERIMENT, sample_name, config)["area"]
+        if len(areas):
+            return areas
+    if not result_store.is_legacy_config(config):
+        return np.array([])
+    return load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_{sample_name}.txt')
+
 # Calculate the mean and variance of the Mandelbrot area results
-def calculate_mean_and_variance():
-    pure_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_Pure.txt')
-    lhs_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_LHS.txt')
-    ortho_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_Ortho.txt')
+def calculate_mean_and_variance(config=None):
+    pure_areas = load_replicate_areas("Pure", config)
+    lhs_areas = load_replicate_areas("LHS", config)
+    ortho_areas = load_replicate_areas("Ortho", config)
 
     mean_pure = np.mean(pure_areas)
     var_pure = np.var(pure_areas)
@@ -46,12 +61,12 @@ def calculate_mean_and_variance():
     }
 
 # Calculate the Mean Squared Error (MSE) of each area result compared to the true area
-def calculate_mse():
+def calculate_mse(config=None):
     true_area = load_area_data(f'{utils.RESULT_DIR}/trueArea.txt')
 
-    pure_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_Pure.txt')
-    lhs_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_LHS.txt')
-    ortho_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_Ortho.txt')
+    pure_areas = load_replicate_areas("Pure", config)
+    lhs_areas = load_replicate_areas("LHS", config)
+    ortho_areas = load_replicate_areas("Ortho", config)
 
     mse_pure = np.mean((pure_areas - true_area) ** 2)
     mse_lhs = np.mean((lhs_areas - true_area) ** 2)
@@ -64,12 +79,12 @@ def calculate_mse():
     }
 
 # Calculate confidence intervals and determine if they include the true area
-def calculate_confidence_intervals():
+def calculate_confidence_intervals(config=None):
     true_area = load_area_data(f'{utils.RESULT_DIR}/trueArea.txt')
 
-    pure_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_Pure.txt')
-    lhs_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_LHS.txt')
-    ortho_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_Ortho.txt')
+    pure_areas = load_replicate_areas("Pure", config)
+    lhs_areas = load_replicate_areas("LHS", config)
+    ortho_areas = load_replicate_areas("Ortho", config)
 
     confidence_level = 0.95
     # calculate the z-value for the confidence level
@@ -110,16 +125,35 @@ def calculate_confidence_intervals():
         'LHS interval': lhs_interval, 
         'Ortho inteval': ortho_interval
     } 
+
+    # the variance reduction estimators, if their replicates were generated
+    for sample_name in utils.VARIANCE_REDUCTION_METHODS:
+        areas = load_replicate_areas(sample_name, config)
+        if len(areas) > 1:
+            intervals[f'{sample_name} interval'] = calculate_interval(areas)
     
     return intervals
 
+# Compare the interval widths with the one of pure random sampling at the same sample size
+def calculate_variance_reduction(intervals):
+    pure_std = intervals['Pure interval']['standard_deviation']
+    reduction = {}
+    for name, interval in intervals.items():
+        # the width goes with std / sqrt(n), so pure sampling needs (pure_std / std)^2 times the samples for the same width
+        variance_ratio = (pure_std / interval['standard_deviation'])**2
+        reduction[name.split()[0]] = {
+            'variance_reduction': variance_ratio,
+            'relative_samples_for_same_width': 1 / variance_ratio
+        }
+    return reduction
+
 # Plot the confidence intervals for the Mandelbrot area results
-def plot_histograms():
-    pure_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_Pure.txt')
-    lhs_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_LHS.txt')
-    ortho_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_Ortho.txt')
+def plot_histograms(config=None):
+    pure_areas = load_replicate_areas("Pure", config)
+    lhs_areas = load_replicate_areas("LHS", config)
+    ortho_areas = load_replicate_areas("Ortho", config)
     true_value = load_area_data(f'{utils.RESULT_DIR}/trueArea.txt')[0]
-    intervals = calculate_confidence_intervals().values()
+    intervals = calculate_confidence_intervals(config).values()
 
     areas = [pure_areas, lhs_areas, ortho_areas]
     labels = ['Pure', 'LHS', 'Ortho']
@@ -153,10 +187,10 @@ def plot_histograms():
         plt.close()
 
 # Plot the confidence intervals for the Mandelbrot area results
-def plot_confidence_intervals(intervals):
-    pure_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_Pure.txt')
-    lhs_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_LHS.txt')
-    ortho_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_Ortho.txt')
+def plot_confidence_intervals(intervals, config=None):
+    pure_areas = load_replicate_areas("Pure", config)
+    lhs_areas = load_replicate_areas("LHS", config)
+    ortho_areas = load_replicate_areas("Ortho", config)
     areas = [pure_areas, lhs_areas, ortho_areas]
 
     labels = ['Pure', 'LHS', 'Ortho']
@@ -193,10 +227,10 @@ def plot_confidence_intervals(intervals):
         plt.close()
 
 # Plot the distributions of the Mandelbrot area results
-def plot_area_distributions():
-    pure_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_Pure.txt')
-    lhs_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_LHS.txt')
-    ortho_areas = load_area_data(f'{utils.STATISTIC_RESULT_DIR}/mandelbrotArea_Ortho.txt')
+def plot_area_distributions(config=None):
+    pure_areas = load_replicate_areas("Pure", config)
+    lhs_areas = load_replicate_areas("LHS", config)
+    ortho_areas = load_replicate_areas("Ortho", config)
 
     data = [pure_areas, lhs_areas, ortho_areas]
     labels = ['Pure', 'LHS', 'Ortho']
@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import time
+
+import numpy as np
+
+RESULT_STORE_PATH = '../simulation_results/results.sqlite'
+
+# experiments of the drivers: the (size, max_iter) grid sweeps and the replicates of one fixed configuration
+SWEEP_EXPERIMENT = "sweep"
+REPLICATE_EXPERIMENT = "same_iter_and_size"
+
+# the config (MandelbrotAnalysis.get_result_config) of the whole plane platform, without symmetric mode and domain,
+# the text results in simulation_results were generated with it
+LEGACY_CONFIG = ((-2, 2), (-2, 2), None, False, [])
+
+COLUMNS = ("experiment", "method", "config", "num_samples", "max_iter", "replicate", "seed", "area", "elapsed", "created")
+
+class ResultStore:
+    """
+    Append-only SQLite store of area results, one row per finished configuration.
+    A row is identified by experiment, method, platform configuration (MandelbrotAnalysis.get_result_config:
+    sampling ranges, domain, symmetric mode and the kernel options that change results), size, max_iter
+    and replicate, so results of a differently configured platform are neither skipped nor mixed in.
+    The drivers append every configuration as soon as it is done, so a crashed sweep keeps what it
+    finished and resumes by skipping the configurations in completed(). Every call opens its own
+    connection, so worker processes and threads can write to the same file (WAL journal).
+    """
+    def __init__(self, path=RESULT_STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._execute("PRAGMA journal_mode=WAL")
+        # a table from before the config column can not tell its configuration, it is kept aside and not used
+        columns = [row[1] for row in self._execute("PRAGMA table_info(results)")]
+        if columns and "config" not in columns:
+            self._execute("ALTER TABLE results RENAME TO results_without_config")
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "id INTEGER PRIMARY KEY, experiment TEXT NOT NULL, method TEXT NOT NULL, config TEXT NOT NULL, "
+            "num_samples INTEGER NOT NULL, max_iter INTEGER NOT NULL, replicate INTEGER NOT NULL DEFAULT 0, "
+            "seed INTEGER, area REAL NOT NULL, elapsed REAL, created REAL NOT NULL, "
+            "UNIQUE (experiment, method, config, num_samples, max_iter, replicate))")
+
+    def _execute(self, query, values=()):
+        # one short connection per statement, committed when it is done
+        connection = sqlite3.connect(self.path, timeout=60)
+        try:
+            with connection:
+                return connection.execute(query, values).fetchall()
+        finally:
+            connection.close()
+
+    def append(self, experiment, method, config, num_samples, max_iter, area, replicate=0, seed=None, elapsed=None):
+        """
+        Store one finished configuration, a configuration which is already stored is left as it is.
+        Input: experiment, method name, platform config, number of samples, max_iter, area, replicate index, seed, elapsed seconds
+        """
+        self._execute(
+            "INSERT OR IGNORE INTO results (experiment, method, config, num_samples, max_iter, replicate, seed, area, elapsed, created) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (experiment, method, config_text(config), int(num_samples), int(max_iter), int(replicate),
+             None if seed is None else int(seed), float(area), None if elapsed is None else float(elapsed), time.time()))
+
+    def completed(self, experiment, method, config):
+        """
+        Output: set of (num_samples, max_iter, replicate) already stored for the experiment, method and platform config
+        """
+        rows = self._execute("SELECT num_samples, max_iter, replicate FROM results WHERE experiment = ? AND method = ? AND config = ?",
+                             (experiment, method, config_text(config)))
+        return set(rows)
+
+    def load(self, experiment=None, method=None, config=None, num_samples=None, max_iter=None, seed=None):
+        """
+        Vectorized read of a slice of the results, every filter that is not None has to match.
+        Without a config the rows must all share one, results of several configurations are never mixed.
+        Output: dict of numpy arrays, one per column, ordered by num_samples, max_iter and replicate
+        """
+        filters = {"experiment": experiment, "method": method, "config": None if config is None else config_text(config),
+                   "num_samples": num_samples, "max_iter": max_iter, "seed": seed}
+        conditions = [f"{name} = ?" for name, value in filters.items() if value is not None]
+        values = [value for value in filters.values() if value is not None]
+        query = f"SELECT {', '.join(COLUMNS)} FROM results"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY num_samples, max_iter, replicate"
+        rows = self._execute(query, values)
+
+        columns = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+        data = {}
+        for name, column in zip(COLUMNS, columns):
+            if name in ("experiment", "method", "config"):
+                data[name] = np.array(column, dtype=str)
+            elif name in ("seed", "elapsed"):
+                data[name] = np.array([np.nan if value is None else value for value in column], dtype=np.float64)
+            elif name in ("area", "created"):
+                data[name] = np.array(column, dtype=np.float64)
+            else:
+                data[name] = np.array(column, dtype=np.int64)
+        if config is None and len(set(data["config"])) > 1:
+            raise ValueError(f"The results come from {len(set(data['config']))} platform configurations, pass the config to load.")
+        return data
+
+def config_text(config):
+    # the config tuple of get_result_config as it is stored, a stored text is passed through
+    return config if isinstance(config, str) else repr(config)
+
+def is_legacy_config(config):
+    # the text result files only hold results of the legacy config, any other config reads and writes only the store
+    return config_text(config) == config_text(LEGACY_CONFIG)
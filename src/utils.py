@@ -1,11 +1,31 @@
 import itertools
 import os
+import time
 import matplotlib.pyplot as plt
 import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+import mandelbrot_analysis
+import result_store
 
 RESULT_DIR = '../simulation_results'
 STATISTIC_RESULT_DIR = '../simulation_results/same_iter_and_size'
 
+# (size, max_iter) grid of the convergence sweeps
+SWEEP_NUM_SAMPLES_ROOTS = [500, 800, 1000, 1600, 2000, 2400, 2600, 3000]
+SWEEP_MAX_ITERS = [100, 150, 200, 240, 300, 400, 600, 700, 800, 900, 1000]
+SWEEP_MSET_LIST = list(itertools.product(SWEEP_NUM_SAMPLES_ROOTS, SWEEP_MAX_ITERS))
+
+# memory for the kernel intermediates of all the sweep tasks which run at the same time, in bytes,
+# every worker gets its share and evaluates its sample set in chunks that fit into it
+SWEEP_MEMORY_BUDGET = 2**31
+
+# the sweep methods whose samples depend on the seed, the others draw from the global random state
+SEEDED_SWEEP_METHODS = ["Ortho", "Sobol", "Halton", "Importance"]
+
+# sample types and names of the control variate and importance sampling estimators
+VARIANCE_REDUCTION_SAMPLE_TYPES = [5, 6]
+VARIANCE_REDUCTION_METHODS = ["ControlVariate", "Importance"]
+
 # -----------------------------------------------------------color_mandelbrot-----------------------------------------------------------
 def mset_colors_parallel(mandelbrotAnalysisPlatform, num_samples, max_iter):
     # 0 is for pure random sampling
@@ -18,20 +38,45 @@ def mset_colors_parallel(mandelbrotAnalysisPlatform, num_samples, max_iter):
 
 def mset_colors_ortho_seq(mandelbrotAnalysisPlatform, num_samples_list_perfect_root, max_iter_list):
     # 2 corresponds to orthogonal sampling
-    # joblib is not able to seriliaze the object which has ctypes pointer, so we have to run this sequentially
+    # sequential version, mset_colors_process_pool runs all three methods in worker processes
     for i, num_samples in enumerate(num_samples_list_perfect_root):
         for j, max_iter in enumerate(max_iter_list):
             sample = mandelbrotAnalysisPlatform.orthogonal_sampling(num_samples)
             mandelbrotAnalysisPlatform.color_mandelbrot(sample, max_iter, 2)
         
+def mset_colors_process_pool(mandelbrotAnalysisPlatform, num_samples_list, num_samples_list_perfect_root, max_iter_list, n_jobs=-1):
+    # the platform drops its ctypes handle when it is pickled and every worker process loads the
+    # library once on its first ortho call, so the ortho plots run in the pool as well
+    jobs = []
+    for max_iter in max_iter_list:
+        for num_samples in num_samples_list:
+            jobs += [(0, num_samples, max_iter), (1, num_samples, max_iter)]
+        for num_samples_root in num_samples_list_perfect_root:
+            jobs.append((2, num_samples_root, max_iter))
+    Parallel(n_jobs=n_jobs, backend="loky")(
+        delayed(mset_color_single)(mandelbrotAnalysisPlatform, sample_type, num_samples, max_iter)
+        for sample_type, num_samples, max_iter in jobs)
+
+def mset_color_single(mandelbrotAnalysisPlatform, sample_type, num_samples, max_iter):
+    # num_samples is the square root of the sample size for orthogonal sampling
+    if sample_type == 2:
+        sample = mandelbrotAnalysisPlatform.orthogonal_sampling(num_samples)
+    elif sample_type == 1:
+        sample = mandelbrotAnalysisPlatform.latin_hypercube_sampling(num_samples)
+    else:
+        sample = mandelbrotAnalysisPlatform.pure_random_sampling(num_samples)
+    mandelbrotAnalysisPlatform.color_mandelbrot(sample, max_iter, sample_type)
+
 # -----------------------------------------------------------inverstigate convergence-----------------------------------------------------------
-def get_and_save_true_area(mandelbrotAnalysisPlatform):
-    max_num_samples_root = 2600
+def get_and_save_true_area(mandelbrotAnalysisPlatform, resolution=2**12):
     max_iter = 800
-    sample = mandelbrotAnalysisPlatform.orthogonal_sampling(max_num_samples_root)
-    plane_area = abs(mandelbrotAnalysisPlatform.real_range[1] - mandelbrotAnalysisPlatform.real_range[0]) * (mandelbrotAnalysisPlatform.imag_range[1] - mandelbrotAnalysisPlatform.imag_range[0])
-    area = mandelbrotAnalysisPlatform.calcu_mandelbrot_area(sample, max_iter, plane_area)
-    print(f"True Area of the Mandelbrot set samples is {area}")
+    # deterministic raster area of the platform domain, only the cells crossing the boundary are evaluated at full resolution,
+    # the cardioid and bulb are skipped in closed form
+    result = mandelbrotAnalysisPlatform.boundary_refined_area(max_iter, resolution, workers=os.cpu_count() or 1, interior_check=True)
+    area = result["area"]
+    # lower and upper are only the crude envelope of the raster, the boundary pixels are counted on a sub-pixel grid
+    print(f"True Area of the Mandelbrot set samples is {area}, raster envelope {result['lower']:.6f} to {result['upper']:.6f} "
+          f"({result['num_boundary_pixels']} boundary pixels, {result['num_evaluated']} points evaluated for {result['num_pixels']} pixels)")
     # Save the result to a file
     with open(f'{RESULT_DIR}/trueArea.txt', "w") as file:
         file.write(f"True Area of the Mandelbrot set samples is {area:.6f}\n")
@@ -52,37 +97,54 @@ def read_area_from_file():
         alpha = 0
     return alpha
 
-def save_area_series_into_files(mandelbrotAnalysisPlatform):
+def save_area_series_into_files(mandelbrotAnalysisPlatform, n_jobs=1, backend="threads", store=None):
     # pick the best combination of num_samples and max_iter
-    num_samples_list_perfect_root = [500, 800, 1000, 1600, 2000, 2400, 2600, 3000]
-    max_iter_list = [100, 150, 200, 240, 300, 400, 600, 700, 800, 900, 1000]
-    mset_list = list(itertools.product(num_samples_list_perfect_root, max_iter_list))
+    mset_list = SWEEP_MSET_LIST
 
     for sample_type in [0, 1, 2]:
         sample_name = mandelbrotAnalysisPlatform.get_sample_name(sample_type)
-        num_samples_vals, max_iter_vals, area_vals = get_mset_area_collection(mandelbrotAnalysisPlatform, mset_list, sample_type)
+        num_samples_vals, max_iter_vals, area_vals = get_mset_area_collection(mandelbrotAnalysisPlatform, mset_list, sample_type, n_jobs=n_jobs, backend=backend,
+                                                                              store=store, experiment=result_store.SWEEP_EXPERIMENT)
+        # the text files are the ones of the legacy platform, the results of another config are only in the store
+        if not result_store.is_legacy_config(mandelbrotAnalysisPlatform.get_result_config()):
+            continue
         # Save pure random sampling data to file
         with open(f'{RESULT_DIR}/mandelbrotArea_{sample_name}.txt', "w") as file:
             for num_samples, max_iter, area in zip(num_samples_vals, max_iter_vals, area_vals):
                 file.write(f"{num_samples} {max_iter} {area:.6f}\n")
 
-def save_area_series_into_files_with_fix_iter_and_size(mandelbrotAnalysisPlatform):
+def save_area_series_into_files_with_fix_iter_and_size(mandelbrotAnalysisPlatform, seed=3737, n_jobs=-1, backend="threads", store=None):
     repeat = 100
     mset_list = [(2600, 800) for _ in range(repeat)]
 
-    for sample_type in [0, 1, 2]:
+    for sample_type in [0, 1, 2] + VARIANCE_REDUCTION_SAMPLE_TYPES:
         sample_name = mandelbrotAnalysisPlatform.get_sample_name(sample_type)
-        num_samples_vals, max_iter_vals, area_vals = get_mset_area_collection(mandelbrotAnalysisPlatform, mset_list, sample_type)
+        # the replicates have to be independent, so ortho gets a seed per replicate
+        num_samples_vals, max_iter_vals, area_vals = get_mset_area_collection(mandelbrotAnalysisPlatform, mset_list, sample_type, seed=seed, n_jobs=n_jobs, backend=backend,
+                                                                              store=store, experiment=result_store.REPLICATE_EXPERIMENT)
+        if not result_store.is_legacy_config(mandelbrotAnalysisPlatform.get_result_config()):
+            continue
         # Save pure random sampling data to file
         os.makedirs(STATISTIC_RESULT_DIR, exist_ok=True)
         with open(f'{STATISTIC_RESULT_DIR}/mandelbrotArea_{sample_name}.txt', "w") as file:
             for num_samples, max_iter, area in zip(num_samples_vals, max_iter_vals, area_vals):
                 file.write(f"{num_samples} {max_iter} {area:.6f}\n")
 
-def read_area_series_from_files(mandelbrotAnalysisPlatform):
+def read_area_series_from_files(mandelbrotAnalysisPlatform, store=None):
     area_data = {}
+    config = mandelbrotAnalysisPlatform.get_result_config()
     for sample_type in [0, 1, 2]:
         sample_name = mandelbrotAnalysisPlatform.get_sample_name(sample_type)
+        # a complete sweep in the result store is used, an interrupted one is resumed by the drivers
+        if store is not None:
+            stored = store.load(result_store.SWEEP_EXPERIMENT, sample_name, config)
+            if len(stored["area"]) >= len(SWEEP_MSET_LIST):
+                area_data[sample_name] = list(zip(stored["num_samples"].tolist(), stored["max_iter"].tolist(), stored["area"].tolist()))
+                continue
+        # the text files hold results of the legacy platform, for another config they count as missing data
+        if not result_store.is_legacy_config(config):
+            area_data[sample_name] = []
+            continue
         try:
             with open(f'{RESULT_DIR}/mandelbrotArea_{sample_name}.txt', "r") as file:
                 area_data[sample_name] = []
@@ -94,7 +156,8 @@ def read_area_series_from_files(mandelbrotAnalysisPlatform):
             area_data[sample_name] = []
     return area_data
 
-def get_mset_area_collection(mandelbrotAnalysisPlatform, mset_list, sample_type=0):
+def get_mset_area_collection(mandelbrotAnalysisPlatform, mset_list, sample_type=0, seed=None, n_jobs=1, backend="threads", store=None, experiment=result_store.SWEEP_EXPERIMENT,
+                             memory_budget=SWEEP_MEMORY_BUDGET):
     # read the true area from the file
     alpha = read_area_from_file()
     if alpha == 0:
@@ -106,20 +169,54 @@ def get_mset_area_collection(mandelbrotAnalysisPlatform, mset_list, sample_type=
     area_vals = []
     sample_name = mandelbrotAnalysisPlatform.get_sample_name(sample_type)
 
+    # with a result store the configurations which finished before are skipped and every new one is stored as soon as it is done
+    # results of a differently configured platform (ranges, domain, symmetric mode) are kept apart
+    config = mandelbrotAnalysisPlatform.get_result_config()
+    completed = store.completed(experiment, sample_name, config) if store is not None else set()
+    plan = plan_mset_sweep(mset_list, seed, completed, sample_name)
+    num_pending = sum(len(task["indexes"]) for task in plan)
+    if num_pending < len(mset_list):
+        print(f"Resuming method {sample_name}: {len(mset_list) - num_pending} of {len(mset_list)} configurations are in the result store already")
+
+    # the seeded ortho sampler keeps its state per call, so the tasks can run in threads,
+    # the library is loaded once here before the threads need it
+    # backend "processes" runs them in loky worker processes instead, they load the library themselves
+    if backend not in ("threads", "processes"):
+        raise ValueError(f"Unknown backend '{backend}', expected 'threads' or 'processes'.")
+    if backend == "threads" and sample_name == "Ortho" and mandelbrotAnalysisPlatform.lib is None and plan:
+        mandelbrotAnalysisPlatform._load_library()
+    parallel_options = {"prefer": "threads"} if backend == "threads" else {"backend": "loky"}
+    # the tasks run at the same time hold their kernel intermediates at the same time, so they share the memory budget
+    worker_memory_budget = memory_budget // max(min(effective_n_jobs(n_jobs), len(plan)), 1) if memory_budget is not None else None
+    results = Parallel(n_jobs=n_jobs, return_as="generator_unordered", **parallel_options)(
+        delayed(run_mset_sweep_task)(mandelbrotAnalysisPlatform, sample_name, task_index, task["num_samples_root"], task["max_iters"], task["seed"], worker_memory_budget)
+        for task_index, task in enumerate(plan))
+
+    # the results arrive in the order the tasks finish, the seed is only stored for the methods which use it
+    stores_seed = sample_name in SEEDED_SWEEP_METHODS
+    areas = {}
+    start_time = time.perf_counter()
+    for done, (task_index, task_areas, elapsed) in enumerate(results, start=1):
+        task = plan[task_index]
+        for index, area in zip(task["indexes"], task_areas):
+            areas[index] = area
+            if store is not None:
+                # elapsed is the time of the whole task, all its thresholds share the one evaluation
+                store.append(experiment, sample_name, config, get_mset_num_samples(sample_name, task["num_samples_root"]), mset_list[index][1], area, task["replicate"], task["seed"] if stores_seed else None, elapsed)
+        print(f"Sweep of method {sample_name}: task {done} of {len(plan)} done ({get_mset_num_samples(sample_name, task['num_samples_root'])} samples, "
+              f"{len(task['max_iters'])} max iterations up to {max(task['max_iters'])}) in {elapsed:.2f} s, {time.perf_counter() - start_time:.2f} s in total")
+    if len(areas) < len(mset_list):
+        stored = store.load(experiment, sample_name, config)
+        stored_areas = dict(zip(zip(stored["num_samples"].tolist(), stored["max_iter"].tolist(), stored["replicate"].tolist()), stored["area"].tolist()))
+        for index, replicate in enumerate(mset_replicates(mset_list)):
+            if index not in areas:
+                num_samples_root, max_iter = mset_list[index]
+                areas[index] = stored_areas[(get_mset_num_samples(sample_name, num_samples_root), max_iter, replicate)]
+
     # run the area collection
-    for num_samples_root, max_iter in mset_list:
-        num_samples = num_samples_root**2
-        if sample_name == "Pure":
-            sample = mandelbrotAnalysisPlatform.pure_random_sampling(num_samples)
-        elif sample_name == "LHS":
-            sample = mandelbrotAnalysisPlatform.latin_hypercube_sampling(num_samples)
-        elif sample_name == "Ortho":
-            sample = mandelbrotAnalysisPlatform.orthogonal_sampling(num_samples_root)
-        else:
-            sample = mandelbrotAnalysisPlatform.pure_random_sampling(num_samples)
-
-        plane_area = abs(mandelbrotAnalysisPlatform.real_range[1] - mandelbrotAnalysisPlatform.real_range[0]) * (mandelbrotAnalysisPlatform.imag_range[1] - mandelbrotAnalysisPlatform.imag_range[0])
-        area = mandelbrotAnalysisPlatform.calcu_mandelbrot_area(sample, max_iter, plane_area)
+    for index, (num_samples_root, max_iter) in enumerate(mset_list):
+        area = areas[index]
+        num_samples = get_mset_num_samples(sample_name, num_samples_root)
         print(f"Area of the Mandelbrot set with method {sample_name}, {num_samples} samples and {max_iter} max iterations is {area}")
 
         # Store data for 3D plotting
@@ -133,6 +230,145 @@ def get_mset_area_collection(mandelbrotAnalysisPlatform, mset_list, sample_type=
 
     return num_samples_vals, max_iter_vals, area_vals
 
+def get_anytime_area_collection(mandelbrotAnalysisPlatform, max_iter, target_half_width=None, time_budget=None, sample_types=(0, 1, 2), seed=None):
+    # every method runs only until its confidence interval is narrow enough (or its time budget is used up),
+    # instead of a fixed grid of sample sizes
+    results = {}
+    for sample_type in sample_types:
+        sample_name = mandelbrotAnalysisPlatform.get_sample_name(sample_type)
+        result = mandelbrotAnalysisPlatform.estimate_area_anytime(sample_type, max_iter, target_half_width, time_budget, seed=seed, interior_check=True)
+        print(f"Area of the Mandelbrot set with method {sample_name} and {max_iter} max iterations is {result['area']:.6f} +- {result['half_width']:.6f}, "
+              f"{result['num_samples']} samples in {result['elapsed']:.2f} s (stopped by {result['stopped_by']})")
+        results[sample_name] = result
+    return results
+
+def get_quadtree_area_collection(mandelbrotAnalysisPlatform, mset_list, seed=None):
+    # multi-level adaptive sampling, mset_list holds (num_samples_root, max_iter) like the grid sweeps
+    results = []
+    for num_samples_root, max_iter in mset_list:
+        result = mandelbrotAnalysisPlatform.quadtree_adaptive_area(num_samples_root**2, max_iter, seed=seed, interior_check=True)
+        print(f"Area of the Mandelbrot set with method Quadtree, {result['num_samples']} samples and {max_iter} max iterations is {result['area']:.6f}, "
+              f"standard error {result['std_error']:.6f} ({result['num_boundary_leaves']} of {result['num_leaves']} leaves on the boundary)")
+        results.append(result)
+    return results
+
+def mset_replicates(mset_list):
+    # repeated configurations are replicates 0, 1, 2, ... of it
+    replicates = []
+    replicate_counts = {}
+    for config in mset_list:
+        replicates.append(replicate_counts.get(config, 0))
+        replicate_counts[config] = replicates[-1] + 1
+    return replicates
+
+def plan_mset_sweep(mset_list, seed=None, completed=(), sample_name=None):
+    """
+    Group a grid of (num_samples_root, max_iter) configurations into tasks that share one sample set.
+    All configurations of the same size and replicate get the same sample set, which is evaluated once
+    up to the largest of their max_iter. Configurations in completed are left out.
+    Input: mset_list, seed (every task gets its own stream spawned from it), completed set of (num_samples, max_iter, replicate),
+           sample_name (the number of samples in completed is the one of get_mset_num_samples)
+    Output: list of tasks, dicts with num_samples_root, replicate, seed, max_iters and the indexes into mset_list, largest first
+    """
+    groups = {}
+    for index, ((num_samples_root, max_iter), replicate) in enumerate(zip(mset_list, mset_replicates(mset_list))):
+        group = groups.setdefault((num_samples_root, replicate), {"num_samples_root": num_samples_root, "replicate": replicate, "max_iters": [], "indexes": []})
+        if (get_mset_num_samples(sample_name, num_samples_root), max_iter, replicate) not in completed:
+            group["max_iters"].append(max_iter)
+            group["indexes"].append(index)
+
+    # with a seed every sample set gets its own independent stream, without one ortho uses
+    # the fixed seed of the library and every set of the same size gets the same points
+    if seed is None:
+        group_seeds = [None] * len(groups)
+    else:
+        group_seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(len(groups))]
+    plan = []
+    for group, group_seed in zip(groups.values(), group_seeds):
+        if group["indexes"]:
+            group["seed"] = group_seed
+            plan.append(group)
+
+    # the most expensive tasks go first, so the short ones fill up the workers at the end
+    plan.sort(key=lambda task: task["num_samples_root"]**2 * max(task["max_iters"]), reverse=True)
+    return plan
+
+def run_mset_sweep_task(mandelbrotAnalysisPlatform, sample_name, task_index, num_samples_root, max_iter_list, seed=None, memory_budget=None):
+    start_time = time.perf_counter()
+    if sample_name in VARIANCE_REDUCTION_METHODS:
+        # the estimators draw their own points per call, there is no sample set to share
+        areas = [get_mset_area(mandelbrotAnalysisPlatform, sample_name, num_samples_root, max_iter, seed, memory_budget) for max_iter in max_iter_list]
+    else:
+        areas = get_mset_area_series(mandelbrotAnalysisPlatform, sample_name, num_samples_root, max_iter_list, seed, memory_budget)
+    return task_index, areas, time.perf_counter() - start_time
+
+def get_mset_num_samples(sample_name, num_samples_root):
+    # the number of points get_mset_sample evaluates, Sobol rounds num_samples_root^2 up to a power of 2
+    num_samples = num_samples_root**2
+    if sample_name == "Sobol":
+        return 2**max(int(num_samples - 1).bit_length(), 0)
+    return num_samples
+
+def get_mset_sample(mandelbrotAnalysisPlatform, sample_name, num_samples_root, seed=None):
+    num_samples = num_samples_root**2
+    if sample_name == "Pure":
+        sample = mandelbrotAnalysisPlatform.pure_random_sampling(num_samples)
+    elif sample_name == "LHS":
+        sample = mandelbrotAnalysisPlatform.latin_hypercube_sampling(num_samples)
+    elif sample_name == "Ortho":
+        sample = mandelbrotAnalysisPlatform.orthogonal_sampling(num_samples_root, seed=seed)
+    elif sample_name == "Sobol":
+        sample = mandelbrotAnalysisPlatform.sobol_sampling(num_samples, seed=seed)
+    elif sample_name == "Halton":
+        sample = mandelbrotAnalysisPlatform.halton_sampling(num_samples, seed=seed)
+    else:
+        sample = mandelbrotAnalysisPlatform.pure_random_sampling(num_samples)
+
+    # the seeded (and the default 3737) designs are deterministic, their escape iterations can be cached
+    if sample_name == "Ortho":
+        cache_key = (sample_name, num_samples_root, 3737 if seed is None else seed)
+    elif sample_name in ("Sobol", "Halton") and seed is not None:
+        cache_key = (sample_name, len(sample), seed)
+    else:
+        cache_key = None
+    return sample, cache_key
+
+def get_mset_chunk_size(memory_budget):
+    # the chunk of samples whose kernel intermediates fit into the memory budget, None for no budget
+    if memory_budget is None:
+        return None
+    return max(memory_budget // mandelbrot_analysis.KERNEL_BYTES_PER_SAMPLE, 1)
+
+def get_mset_area_series(mandelbrotAnalysisPlatform, sample_name, num_samples_root, max_iter_list, seed=None, memory_budget=None):
+    # one sample set, iterated once up to the largest max_iter, gives the area for every max_iter
+    sample, cache_key = get_mset_sample(mandelbrotAnalysisPlatform, sample_name, num_samples_root, seed)
+    plane_area = mandelbrotAnalysisPlatform.get_plane_area()
+    return mandelbrotAnalysisPlatform.calcu_mandelbrot_area_series(sample, max_iter_list, plane_area, chunk_size=get_mset_chunk_size(memory_budget), cache_key=cache_key)
+
+def get_mset_area(mandelbrotAnalysisPlatform, sample_name, num_samples_root, max_iter, seed=None, memory_budget=None):
+    plane_area = mandelbrotAnalysisPlatform.get_plane_area()
+    chunk_size = get_mset_chunk_size(memory_budget)
+    # the variance reduction estimators, on uniform random samples (control variate) or their own proposal (importance)
+    if sample_name == "ControlVariate":
+        sample = mandelbrotAnalysisPlatform.pure_random_sampling(num_samples_root**2)
+        return round(float(mandelbrotAnalysisPlatform.control_variate_area(sample, max_iter, plane_area, chunk_size=chunk_size, interior_check=True)["area"]), 6)
+    if sample_name == "Importance":
+        return round(float(mandelbrotAnalysisPlatform.importance_sampling_area(num_samples_root**2, max_iter, seed=seed, chunk_size=chunk_size, interior_check=True)["area"]), 6)
+    sample, cache_key = get_mset_sample(mandelbrotAnalysisPlatform, sample_name, num_samples_root, seed)
+    return mandelbrotAnalysisPlatform.calcu_mandelbrot_area(sample, max_iter, plane_area, chunk_size=chunk_size, cache_key=cache_key)
+
+def get_nested_area_series(mandelbrotAnalysisPlatform, num_samples_list, max_iter, sample_type=3, seed=None):
+    # Sobol and Halton designs are nested, every size reuses the points of the sizes before it,
+    # so the whole series costs as much as its largest size
+    refinement = mandelbrot_analysis.QuasiRandomRefinement(mandelbrotAnalysisPlatform, max_iter, sample_type, seed, interior_check=True)
+    num_samples_vals = sorted(num_samples_list)
+    area_vals = []
+    for num_samples in num_samples_vals:
+        area = refinement.refine(num_samples)
+        print(f"Area of the Mandelbrot set with method {refinement.sample_name}, {num_samples} samples and {max_iter} max iterations is {area}")
+        area_vals.append(area)
+    return num_samples_vals, area_vals
+
 # Plot individual 3D plots for each sampling method
 def plot_individual_3d(num_samples_vals, max_iter_vals, area_diff_vals, color, marker, label, filename):
     fig = plt.figure(figsize=(14, 10))
@@ -174,6 +410,10 @@ def generate_heatmap(data_x, data_y, data_z, title, xlabel, ylabel, filename):
     plt.savefig(filename)
     plt.close()
 
+# the two files plot_convergence_curve writes
+def convergence_curve_files(filename_prefix):
+    return [f'{filename_prefix}_iterations.png', f'{filename_prefix}_samples.png']
+
 def plot_convergence_curve(num_samples_vals, max_iter_vals, area_vals_diff, method_name, filename_prefix):
     # Plot convergence with respect to iterations for different sample sizes
     fig, ax = plt.subplots(figsize=(10, 8))
@@ -207,16 +447,22 @@ def plot_convergence_curve(num_samples_vals, max_iter_vals, area_vals_diff, meth
     plt.savefig(f'{filename_prefix}_samples.png')
     plt.close()
 
+# the sample sizes of the comparison, the unique ones of the fourth method of the data set
+def get_comparison_sample_sizes(area_data_set):
+    return sorted({num_samples for num_samples, _, _ in list(area_data_set.values())[3]})
+
+# all the files plot_convergence_comparison writes, one per sample size and the MSE comparison
+def convergence_comparison_files(area_data_set, filename_prefix):
+    files = [f"{filename_prefix}_convergence_comparison_with_fixed_size_{fixed_sample_size}.png" for fixed_sample_size in get_comparison_sample_sizes(area_data_set)]
+    return files + [f"{filename_prefix}_MSE_comparison.png"]
+
 def plot_convergence_comparison(area_data_set, trueArea, filename_prefix):
     # Select a fixed sample size (the first sample size in the data set)
     # fixed_sample_size = list(area_data_set.values())[0][0][0]
     # fixed_sample_size = 2560000
 
     # find unique sample size in area_data_set
-    sample_sizes = set()
-    sample_sizes.update([num_samples for num_samples, _, _ in list(area_data_set.values())[3]])
-    # sort sample sizes
-    sample_sizes = sorted(sample_sizes)
+    sample_sizes = get_comparison_sample_sizes(area_data_set)
     
     MSEs = {}
     for method_name, area_data in area_data_set.items():
@@ -261,4 +507,5 @@ def plot_convergence_comparison(area_data_set, trueArea, filename_prefix):
     plt.legend()
     plt.grid(True)
     plt.savefig(f"{filename_prefix}_MSE_comparison.png")
+    plt.close()
     print(f"MSEs: {MSEs}")
\ No newline at end of file